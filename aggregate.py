@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+from collections import Counter
+
+import pandas as pd
+
+from metrics import METRICS
+
+# 无用的关键词（不区分大小写），统计关键词频率时去掉
+KEYWORD_STOPWORDS = {
+    "artificial intelligence", "machine learning", "cell", "cells", "neural networks",
+    "abstract","deep learning","such","based","nanoparticles","nanotechnology","available",
+    "nanomedicine","nanoparticle","analysis","nanomedicines","learning",
+    "artificial neural networks","artificial neural network","using","will","prediction",
+    "were","support vector machine","time","future","effect","properties","care","model",
+    "standards","machine","values","hospital","university","deep","neural network","motion",
+    "algorithm","models","human","been","risk","images","proposed","walking","self","biomaterial",
+    "biomaterials","features","feature","different","studies","gait","computer visions"
+}
+
+# 频率表名称 -> 统计的列
+TABLE_COLUMNS = {
+    "first_author": "First Author",
+    "corresponding_author": "Corresponding Author",
+    "university": "University",
+    "country": "Country",
+    "keywords": "Keywords",
+    "publication_year": "Publication Year",
+}
+
+TABLES_DIR = "frequency_tables"  # 频率表保存在数据目录下的这个子目录中
+
+# 部分频率表的统计规则版本；统计或过滤逻辑变化时加 1，旧的部分频率表全部重新统计
+INDEX_VERSION = 1
+
+
+def count_values(column):
+    """统计一列中每个值出现的次数（忽略空值）。"""
+    counts = column.dropna().value_counts()
+    return Counter(counts[counts > 0].to_dict())
+
+
+def count_keywords(column):
+    """把关键词列按逗号拆分、去掉首尾空白和无用词后统计频率（与 burble.clean_keywords 的清洗规则一致）。"""
+    keywords = column.dropna().astype(str).str.split(",").explode().str.strip()
+    keywords = keywords[(keywords != "") & ~keywords.str.lower().isin(KEYWORD_STOPWORDS)]
+    return Counter(keywords.value_counts().to_dict())
+
+
+def count_years(column):
+    """统计每个出版年份的文献数，无法解析为年份的值被忽略。"""
+    years = pd.to_numeric(column.astype(object), errors="coerce").dropna().astype(int)
+    return Counter(years.value_counts().to_dict())
+
+
+def aggregate_table(df):
+    """扫描一个数据表，一次生成全部频率表：{表名: Counter}。数据表中没有的列得到空表。"""
+    tables = {}
+    for name, column in TABLE_COLUMNS.items():
+        if column not in df:
+            tables[name] = Counter()
+        elif name == "keywords":
+            tables[name] = count_keywords(df[column])
+        elif name == "publication_year":
+            tables[name] = count_years(df[column])
+        else:
+            tables[name] = count_values(df[column])
+    return tables
+
+
+def merge_tables(tables_list):
+    """合并多个数据表的频率表（对应的计数相加）。"""
+    merged = {name: Counter() for name in TABLE_COLUMNS}
+    for tables in tables_list:
+        for name, counts in tables.items():
+            merged[name].update(counts)
+    return merged
+
+
+def aggregate_tables(dataframes):
+    """依次扫描多个数据表（可以是生成器），返回合并后的频率表；每个数据表只读取、统计一次。"""
+    return merge_tables(aggregate_table(df) for df in dataframes)
+
+
+def save_tables(tables, directory):
+    """把频率表保存为 <directory>/frequency_tables/<表名>.csv（Value, Count 两列，按次数从高到低）。"""
+    tables_dir = os.path.join(directory, TABLES_DIR)
+    os.makedirs(tables_dir, exist_ok=True)
+    for name, counts in tables.items():
+        df = pd.DataFrame(counts.most_common(), columns=["Value", "Count"])
+        df.to_csv(os.path.join(tables_dir, name + ".csv"), index=False, encoding="utf-8-sig")
+    return tables_dir
+
+
+def load_tables(directory):
+    """读取 save_tables 保存的频率表，文件不存在的表为空。"""
+    tables = {}
+    tables_dir = os.path.join(directory, TABLES_DIR)
+    for name in TABLE_COLUMNS:
+        filepath = os.path.join(tables_dir, name + ".csv")
+        if not os.path.exists(filepath):
+            tables[name] = Counter()
+            continue
+        df = pd.read_csv(filepath, dtype={"Value": str}, keep_default_na=False, encoding="utf-8-sig")
+        values = df["Value"].astype(int) if name == "publication_year" else df["Value"]
+        tables[name] = Counter(dict(zip(values, df["Count"])))
+    return tables
+
+
+def _table_files(path):
+    """数据表包含的文件：CSV 文件本身，或 Parquet 分区目录中的 .parquet 文件。"""
+    if os.path.isfile(path):
+        return [path]
+    return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".parquet"))
+
+
+def table_signature(path):
+    """数据表（CSV 文件或 Parquet 分区目录）的签名：每个文件的 (文件名, 大小, 修改时间)。"""
+    return [[os.path.basename(file), os.path.getsize(file), os.stat(file).st_mtime_ns] for file in _table_files(path)]
+
+
+def content_hash(path):
+    """数据表全部文件内容的 SHA-1（签名变化时用于确认内容是否真的改变）。"""
+    digest = hashlib.sha1()
+    for file in _table_files(path):
+        digest.update(os.path.basename(file).encode("utf-8"))
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class AggregateIndex:
+    """
+    数据目录的增量统计索引：<目录>/frequency_tables/manifest.json 记录每个数据表的签名和内容哈希，
+    每个数据表的部分频率表保存在 frequency_tables/partials/<哈希>.json。
+    重新统计时只读取新增或内容变化的数据表，其余数据表直接使用保存的部分频率表合并。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables_dir = os.path.join(directory, TABLES_DIR)
+        self.partials_dir = os.path.join(self.tables_dir, "partials")
+        self.manifest_path = os.path.join(self.tables_dir, "manifest.json")
+        os.makedirs(self.partials_dir, exist_ok=True)
+        self.manifest = {"version": INDEX_VERSION, "tables": {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == INDEX_VERSION:
+                self.manifest = manifest
+
+    def _save(self):
+        # 先写临时文件再替换，避免中断时留下损坏的索引文件
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _partial_path(self, key):
+        return os.path.join(self.partials_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _load_partial(self, key):
+        with open(self._partial_path(key), encoding="utf-8") as f:
+            partial = json.load(f)
+        return {name: Counter(dict((value, count) for value, count in pairs)) for name, pairs in partial.items()}
+
+    def _save_partial(self, key, tables):
+        # 保存为 [值, 次数] 列表，年份保持整数类型
+        partial = {name: [[value, int(count)] for value, count in counts.items()] for name, counts in tables.items()}
+        with open(self._partial_path(key), "w", encoding="utf-8") as f:
+            json.dump(partial, f, ensure_ascii=False)
+
+    def update(self, table_paths, load):
+        """
+        更新索引并返回 (合并后的频率表, 是否有数据表新增、变化或删除)。
+        :param table_paths: 目录中当前的全部数据表路径
+        :param load: load(数据表路径) -> DataFrame，只对新增或变化的数据表调用
+        """
+        entries = self.manifest["tables"]
+        partials = []
+        changed = False
+        current = set()
+        for table_path in table_paths:
+            key = os.path.relpath(table_path, self.directory)
+            current.add(key)
+            entry = entries.get(key)
+            signature = table_signature(table_path)
+            if entry is not None and entry["signature"] == signature and os.path.exists(self._partial_path(key)):
+                partials.append(self._load_partial(key))
+                METRICS.inc("tables_reused_total")
+                continue
+
+            # 签名变化（例如文件被重新写入）但内容没变时，只更新签名
+            digest = content_hash(table_path)
+            if entry is not None and entry["hash"] == digest and os.path.exists(self._partial_path(key)):
+                entry["signature"] = signature
+                partials.append(self._load_partial(key))
+                METRICS.inc("tables_reused_total")
+                continue
+
+            print(f"Aggregating {table_path}...")
+            with METRICS.stage("load"):
+                df = load(table_path)
+            with METRICS.stage("aggregate"):
+                tables = aggregate_table(df)
+            METRICS.inc("tables_aggregated_total")
+            METRICS.inc("records_aggregated_total", len(df))
+            self._save_partial(key, tables)
+            entries[key] = {"signature": signature, "hash": digest}
+            partials.append(tables)
+            changed = True
+
+        # 已删除的数据表
+        for key in set(entries) - current:
+            del entries[key]
+            if os.path.exists(self._partial_path(key)):
+                os.remove(self._partial_path(key))
+            changed = True
+
+        self._save()
+        return merge_tables(partials), changed
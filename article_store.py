@@ -0,0 +1,101 @@
+import json
+import sqlite3
+import threading
+
+from eutils import AdaptiveBatchSize, EutilsClient, iter_efetch
+from metrics import METRICS
+from planner import ESEARCH_CAP
+from pubmed_xml import iter_article_elements, extract_fields
+
+# extract_fields 的输出格式版本；解析逻辑变化时加 1，旧版本的记录会被视为缺失并重新下载
+SCHEMA_VERSION = 3
+
+
+class ArticleStore:
+    """
+    以 PMID 为键的本地文献库（SQLite），保存 extract_fields 解析出的原始字段（JSON）。
+    不同检索式检索到的同一篇文献只需下载、解析一次。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # 多个进程（如 batch_harvest.py 的工作进程）共用同一个库时，最多等待 60 秒写锁
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                pmid TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                fields TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def missing(self, pmids):
+        """返回 pmids 中库里还没有（或版本过旧）的 PMID，保持原顺序。"""
+        found = set(self.get_many(pmids))
+        return [pmid for pmid in pmids if pmid not in found]
+
+    def get_many(self, pmids):
+        """批量读取文献，返回 {pmid: fields}。"""
+        result = {}
+        pmids = list(pmids)
+        with self._lock:
+            # SQLite 对单条语句的参数个数有限制，分批查询
+            for start in range(0, len(pmids), 500):
+                batch = pmids[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT pmid, fields FROM articles WHERE version = ? AND pmid IN ({})".format(
+                        ",".join("?" * len(batch))),
+                    [SCHEMA_VERSION] + batch
+                ).fetchall()
+                for pmid, fields in rows:
+                    result[pmid] = json.loads(fields)
+        return result
+
+    def put_many(self, fields_list):
+        """批量写入（覆盖）文献。"""
+        rows = [(fields["pmid"], SCHEMA_VERSION, json.dumps(fields, ensure_ascii=False))
+                for fields in fields_list if fields["pmid"]]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO articles (pmid, version, fields) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM articles WHERE version = ?",
+                                      (SCHEMA_VERSION,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def search_fields(term, store, client=None, date_range=None, batch_size=200, concurrency=4):
+    """
+    通过文献库检索：esearch 取得全部 PMID 后，只 efetch 库中没有的文献，
+    最后按 esearch 的顺序从库中分批读取并逐条产出各篇文献的原始字段（生成器）。
+    efetch 的批次大小从 batch_size 开始按响应耗时和大小自动调整。
+    """
+    if client is None:
+        client = EutilsClient()
+    count, pmids = client.esearch(term, 0, ESEARCH_CAP, date_range)
+    if count > ESEARCH_CAP:
+        print(f"Warning: {count} records found, only the first {ESEARCH_CAP} can be retrieved.")
+
+    missing = store.missing(pmids)
+    print(f"{len(pmids)} articles found, {len(pmids) - len(missing)} already in the local store.")
+    batch = AdaptiveBatchSize(initial=batch_size)
+    for start, content in iter_efetch(missing, batch_size, concurrency, client, batch):
+        with METRICS.stage("parse"):
+            fields_list = [extract_fields(article) for article in iter_article_elements(content)]
+        print(f"Fetched articles from {start} to {start + len(fields_list)}...")
+        with METRICS.stage("store"):
+            store.put_many(fields_list)
+
+    for start in range(0, len(pmids), 500):
+        chunk = pmids[start:start + 500]
+        stored = store.get_many(chunk)
+        for pmid in chunk:
+            if pmid in stored:
+                yield stored[pmid]
@@ -0,0 +1,292 @@
+import itertools
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from metrics import METRICS
+from normalize import clean_affiliation, extract_country
+from pubmed_xml import author_affiliation, author_name
+from records import intern_value
+
+# 三个合作矩阵：作者合著、单位合作、国家合作
+KINDS = ("author", "institution", "country")
+# 无法识别的单位和国家不计入合作关系
+UNKNOWN_VALUES = {"Unknown Institution", "Unknown Country"}
+# 作者数超过该值的文献（大型合作组）不计入合作关系，避免一篇文献产生上万条边
+MAX_PAIR_AUTHORS = 100
+
+SQLITE_VARIABLES = 500  # 每条 SQL 语句最多的参数个数
+
+
+def author_entries(authors, corresponding=None):
+    """
+    由 extract_fields 的作者列表生成紧凑的作者条目 [(姓名, 规范化单位, 国家, 是否通讯作者)]，按作者顺序；
+    没有姓名的团体作者跳过，没有单位的作者单位和国家为 None。
+    """
+    entries = []
+    for author in authors:
+        if author["last_name"] is None or author["fore_name"] is None:
+            continue
+        affiliation = author_affiliation(author)
+        if affiliation is None:
+            institution = country = None
+        else:
+            institution = intern_value(clean_affiliation(affiliation))
+            country = intern_value(extract_country(affiliation))
+        entries.append((author_name(author), institution, country, author is corresponding))
+    return entries
+
+
+def _pairs(ids):
+    """一篇文献中不同的 id 两两组合，返回双向的 (行, 列)；只有一个 id 或超过 MAX_PAIR_AUTHORS 时为空。"""
+    ids = np.unique(np.asarray(ids, dtype=np.int64))
+    if len(ids) < 2 or len(ids) > MAX_PAIR_AUTHORS:
+        return None
+    i, j = np.triu_indices(len(ids), 1)
+    return np.concatenate([ids[i], ids[j]]), np.concatenate([ids[j], ids[i]])
+
+
+class AuthorGraph:
+    """
+    全部作者的单位/国家表和增量更新的合作网络，保存在目录 directory 中：
+    authors.sqlite 按 PMID 保存每篇文献的作者（作者、单位、国家用整数编号），graph.npz 保存三个对称的
+    稀疏邻接矩阵（CSR，值为合作的文献数）。新文献的边先缓存，查询或保存时一次合并到矩阵中；
+    graph.npz 只是缓存，与 authors.sqlite 不一致时（例如多个进程写入）从作者表重建。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.graph_path = os.path.join(directory, "graph.npz")
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # 多个进程（如 batch_harvest.py 的工作进程）共用同一个作者表时，最多等待 60 秒写锁
+        self._conn = sqlite3.connect(os.path.join(directory, "authors.sqlite"), timeout=60,
+                                     check_same_thread=False, isolation_level=None)
+        for kind in KINDS:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {kind} (id INTEGER PRIMARY KEY, value TEXT UNIQUE NOT NULL)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS authorship (
+                pmid TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                author INTEGER NOT NULL,
+                institution INTEGER,
+                country INTEGER,
+                corresponding INTEGER NOT NULL,
+                PRIMARY KEY (pmid, position)
+            ) WITHOUT ROWID
+        """)
+        self._ids = {kind: {} for kind in KINDS}      # 值 -> 编号
+        self._values = {kind: {} for kind in KINDS}   # 编号 -> 值
+        self._matrices = None                         # 第一次查询或保存时读取
+        self._pending = {kind: [] for kind in KINDS}  # 尚未合并到矩阵中的边 [(行, 列)]
+        self._added = 0                               # 本进程加入、尚未保存的文献数
+
+    def _resolve(self, kind, values):
+        """把值转为编号，新值写入编号表（在调用方的事务中）。"""
+        missing = [value for value in values if value not in self._ids[kind]]
+        if missing:
+            self._conn.executemany(f"INSERT OR IGNORE INTO {kind} (value) VALUES (?)", ((value,) for value in missing))
+            for start in range(0, len(missing), SQLITE_VARIABLES):
+                batch = missing[start:start + SQLITE_VARIABLES]
+                for id_, value in self._conn.execute(
+                        f"SELECT id, value FROM {kind} WHERE value IN ({','.join('?' * len(batch))})", batch):
+                    self._ids[kind][value] = id_
+                    self._values[kind][id_] = value
+        return self._ids[kind]
+
+    def _load_values(self, kind):
+        for id_, value in self._conn.execute(f"SELECT id, value FROM {kind}"):
+            self._ids[kind][value] = id_
+            self._values[kind][id_] = value
+
+    def _article_edges(self, edges, authors, institutions, countries):
+        """把一篇文献的作者、单位、国家编号两两组合，加入 edges（{类别: [(行, 列)]}）。"""
+        for kind, ids in zip(KINDS, (authors, institutions, countries)):
+            if kind != "author":
+                ids = [id_ for id_ in ids if id_ is not None and self._values[kind][id_] not in UNKNOWN_VALUES]
+            pairs = _pairs(ids)
+            if pairs is not None:
+                edges[kind].append(pairs)
+
+    def add(self, records):
+        """
+        加入一批文献（带 authors 条目的 ArticleRecord，见 author_entries）的作者，返回新加入的文献数；
+        PMID 已经在作者表中的文献跳过。
+        """
+        articles = {}
+        for record in records:
+            pmid = record.get("PMID")
+            entries = getattr(record, "authors", None)
+            if pmid and entries and pmid not in articles:
+                articles[pmid] = entries
+        if not articles:
+            return 0
+
+        with self._lock, METRICS.stage("graph"):
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                pmids = list(articles)
+                for start in range(0, len(pmids), SQLITE_VARIABLES):
+                    batch = pmids[start:start + SQLITE_VARIABLES]
+                    for pmid, in self._conn.execute(
+                            f"SELECT DISTINCT pmid FROM authorship WHERE pmid IN ({','.join('?' * len(batch))})", batch):
+                        del articles[pmid]
+
+                author_ids = self._resolve("author", {entry[0] for entries in articles.values() for entry in entries})
+                institution_ids = self._resolve("institution", {entry[1] for entries in articles.values()
+                                                                for entry in entries if entry[1] is not None})
+                country_ids = self._resolve("country", {entry[2] for entries in articles.values()
+                                                        for entry in entries if entry[2] is not None})
+                rows = []
+                edges = {kind: [] for kind in KINDS}
+                for pmid, entries in articles.items():
+                    ids = [(author_ids[name], institution_ids.get(institution), country_ids.get(country))
+                           for name, institution, country, _ in entries]
+                    rows += [(pmid, position, author, institution, country, int(entry[3]))
+                             for position, ((author, institution, country), entry) in enumerate(zip(ids, entries))]
+                    self._article_edges(edges, *zip(*ids))
+                self._conn.executemany("INSERT INTO authorship (pmid, position, author, institution, country, "
+                                       "corresponding) VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            # 提交之后才加入待合并的边，回滚时矩阵不受影响
+            for kind in KINDS:
+                self._pending[kind] += edges[kind]
+            self._added += len(articles)
+        METRICS.inc("authorship_rows_total", len(rows))
+        return len(articles)
+
+    def _article_count(self):
+        return self._conn.execute("SELECT COUNT(DISTINCT pmid) FROM authorship").fetchone()[0]
+
+    def _ensure_loaded(self):
+        """读取 graph.npz；它与作者表不一致时从作者表重建全部矩阵（包括本进程待合并的边）。"""
+        if self._matrices is not None:
+            return
+        for kind in KINDS:
+            self._load_values(kind)
+        stored = self._article_count() - self._added  # graph.npz 应包含的文献数
+        if os.path.exists(self.graph_path):
+            with np.load(self.graph_path) as saved:
+                if int(saved["articles"]) == stored:
+                    self._matrices = {kind: sp.csr_matrix((saved[kind + "_data"], saved[kind + "_indices"],
+                                                           saved[kind + "_indptr"]), shape=tuple(saved[kind + "_shape"]))
+                                      for kind in KINDS}
+                    return
+        self._rebuild()
+
+    def _rebuild(self):
+        print(f"Rebuilding collaboration matrices from {self.directory}...")
+        self._pending = {kind: [] for kind in KINDS}
+        self._matrices = {kind: sp.csr_matrix((1, 1), dtype=np.int32) for kind in KINDS}
+        rows = self._conn.execute("SELECT pmid, author, institution, country FROM authorship ORDER BY pmid, position")
+        for _, group in itertools.groupby(rows, key=lambda row: row[0]):
+            self._article_edges(self._pending, *list(zip(*group))[1:])
+
+    def _fold(self):
+        """把待合并的边加入矩阵（矩阵按编号表的大小扩展）。"""
+        self._ensure_loaded()
+        for kind in KINDS:
+            size = max(self._values[kind], default=0) + 1
+            matrix = self._matrices[kind]
+            if matrix.shape != (size, size):
+                matrix = sp.csr_matrix((matrix.data, matrix.indices,
+                                        np.pad(matrix.indptr, (0, size - matrix.shape[0]), mode="edge")),
+                                       shape=(size, size))
+            if self._pending[kind]:
+                rows = np.concatenate([pair[0] for pair in self._pending[kind]])
+                cols = np.concatenate([pair[1] for pair in self._pending[kind]])
+                delta = sp.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(size, size))
+                matrix = (matrix + delta).tocsr()
+                self._pending[kind] = []
+            self._matrices[kind] = matrix
+
+    def matrix(self, kind="author"):
+        """合作矩阵（CSR，行列为编号，值为共同发表的文献数）。"""
+        with self._lock:
+            self._fold()
+            return self._matrices[kind]
+
+    def save(self):
+        """合并待处理的边并保存 graph.npz（先写临时文件再替换）。"""
+        with self._lock:
+            self._fold()
+            arrays = {"articles": self._article_count()}
+            for kind, matrix in self._matrices.items():
+                arrays.update({kind + "_data": matrix.data, kind + "_indices": matrix.indices,
+                               kind + "_indptr": matrix.indptr, kind + "_shape": np.array(matrix.shape)})
+            tmp_path = self.graph_path + ".tmp.npz"
+            np.savez_compressed(tmp_path, **arrays)
+            os.replace(tmp_path, self.graph_path)
+            self._added = 0
+
+    def _top(self, kind, ids, counts, k):
+        order = np.lexsort((ids, -counts))[:k]
+        return [(self._values[kind][int(ids[i])], int(counts[i])) for i in order]
+
+    def top_collaborators(self, value, k=10, kind="author"):
+        """与 value（作者姓名、单位或国家）合作最多的 k 个对象：[(值, 合作文献数)]。"""
+        matrix = self.matrix(kind)
+        id_ = self._ids[kind].get(value)
+        if id_ is None or id_ >= matrix.shape[0]:
+            return []
+        row = matrix.getrow(id_)
+        return self._top(kind, row.indices, row.data, k)
+
+    def top_degree(self, kind="author", k=10):
+        """合作对象最多的 k 个作者（或单位、国家）：[(值, 不同合作对象数)]。"""
+        matrix = self.matrix(kind)
+        degrees = np.diff(matrix.indptr)
+        ids = np.flatnonzero(degrees)
+        return self._top(kind, ids, degrees[ids], k)
+
+    def country_pairs(self, k=None):
+        """国家合作对及其合作文献数（DataFrame：Country A, Country B, Count，按次数从高到低）。"""
+        upper = sp.triu(self.matrix("country"), k=1).tocoo()
+        order = np.lexsort((upper.col, upper.row, -upper.data))[:k]
+        names = self._values["country"]
+        return pd.DataFrame({"Country A": [names[int(upper.row[i])] for i in order],
+                             "Country B": [names[int(upper.col[i])] for i in order],
+                             "Count": upper.data[order].astype(int)})
+
+    def author_table(self, pmids=None):
+        """作者表（DataFrame：PMID, Position, Author, Institution, Country, Corresponding），可只取部分文献。"""
+        sql = ("SELECT a.pmid, a.position, n.value, i.value, c.value, a.corresponding FROM authorship a "
+               "JOIN author n ON n.id = a.author LEFT JOIN institution i ON i.id = a.institution "
+               "LEFT JOIN country c ON c.id = a.country")
+        with self._lock:
+            if pmids is None:
+                rows = self._conn.execute(sql + " ORDER BY a.pmid, a.position").fetchall()
+            else:
+                pmids = list(pmids)
+                rows = []
+                for start in range(0, len(pmids), SQLITE_VARIABLES):
+                    batch = pmids[start:start + SQLITE_VARIABLES]
+                    rows += self._conn.execute(sql + f" WHERE a.pmid IN ({','.join('?' * len(batch))})"
+                                               " ORDER BY a.pmid, a.position", batch).fetchall()
+        df = pd.DataFrame(rows, columns=["PMID", "Position", "Author", "Institution", "Country", "Corresponding"])
+        df["Corresponding"] = df["Corresponding"].astype(bool)
+        return df.astype({"Institution": "category", "Country": "category"})
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def add_to_graph(articles, graph, batch_size=1000):
+    """流水线中的作者阶段（生成器）：文献原样产出，同时按批把作者加入 graph（AuthorGraph）。"""
+    batch = []
+    for article in articles:
+        batch.append(article)
+        yield article
+        if len(batch) >= batch_size:
+            graph.add(batch)
+            batch = []
+    if batch:
+        graph.add(batch)
@@ -0,0 +1,197 @@
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from article_store import ArticleStore
+from checkpoint import HarvestCheckpoint
+from dataset import OUTPUT_DIR
+from eutils import RATE_FILE, EutilsClient, default_api_key, make_limiter
+from keywords import KeywordModel
+from metrics import METRICS
+from pubmed import harvest_topic
+from response_cache import ResponseCache
+from text_index import TextIndex
+from dedup import NearDuplicateIndex
+from authors import AuthorGraph
+
+# 任务说明中可以省略的设置
+DEFAULT_SETTINGS = {
+    "output_dir": OUTPUT_DIR,
+    "output_format": "csv",      # "csv" 或 "parquet"
+    "cache": None,               # 响应缓存（SQLite）路径
+    "store": None,               # 本地文献库（SQLite）路径
+    "index": None,               # 全文索引（SQLite）路径，导出的文献同时加入索引
+    "dedup": None,               # 近似重复检测的签名库（SQLite）路径，近似重复的文献不导出
+    "graph": None,               # 作者表和合作网络的目录
+    "checkpoint_dir": None,      # 断点目录，每个任务使用其中的一个子目录
+    "incremental": False,
+    "rate_file": None,           # 共享访问频率额度的令牌桶文件，默认放在临时目录
+    "years_per_task": None,      # 把每个检索的年份范围拆成若干个任务，默认一个检索一个任务
+    "workers": os.cpu_count(),
+    "report": None,              # 运行报告路径，默认 <output_dir>/batch_report-<时间>.json
+}
+
+_worker = {}  # 工作进程中复用的客户端、响应缓存和文献库
+
+
+def load_job_spec(path):
+    """
+    读取任务说明（JSON）并补全默认设置。格式：
+    {"output_format": "csv", "cache": "pubmed_cache.sqlite", "years_per_task": 10, "workers": 4,
+     "jobs": [{"name": "Bio-imaging", "topic": "...", "start_year": 1960, "end_year": 2024}, ...]}
+    每个检索的 name 是输出数据集名称（文件名前缀），也可以单独指定 output_dir 和 output_format。
+    """
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    settings = dict(DEFAULT_SETTINGS, **{key: value for key, value in spec.items() if key != "jobs"})
+    jobs = spec.get("jobs") or []
+    for job in jobs:
+        missing = {"name", "topic", "start_year", "end_year"} - set(job)
+        if missing:
+            raise ValueError(f"job {job.get('name', job)!r} is missing {', '.join(sorted(missing))}")
+    names = [job["name"] for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("job names must be unique (they name the output files)")
+    return settings, jobs
+
+
+def plan_tasks(jobs, years_per_task=None):
+    """把检索拆成任务：每个任务是一个检索的一段年份范围（不同任务写入不同年份的文件，互不冲突）。"""
+    tasks = []
+    for job in jobs:
+        step = years_per_task or job["end_year"] - job["start_year"] + 1
+        for start_year in range(job["start_year"], job["end_year"] + 1, step):
+            end_year = min(start_year + step - 1, job["end_year"])
+            tasks.append(dict(job, start_year=start_year, end_year=end_year))
+    return tasks
+
+
+def _init_worker(settings):
+    """工作进程初始化：同一进程中的任务共用 HTTP 连接池、响应缓存、文献库和各个索引，所有进程共用一个限流文件。"""
+    api_key = default_api_key()
+    cache = ResponseCache(settings["cache"]) if settings["cache"] else None
+    _worker["client"] = EutilsClient(api_key=api_key, limiter=make_limiter(api_key, settings["rate_file"]),
+                                     cache=cache)
+    _worker["store"] = ArticleStore(settings["store"]) if settings["store"] else None
+    _worker["index"] = TextIndex(settings["index"]) if settings["index"] else None
+    _worker["dedup"] = NearDuplicateIndex(settings["dedup"]) if settings["dedup"] else None
+    _worker["graph"] = AuthorGraph(settings["graph"]) if settings["graph"] else None
+
+
+def run_task(task, settings):
+    """在工作进程中运行一个任务（harvest_topic），返回任务结果：耗时、状态和本次任务的计数器增量。"""
+    checkpoint = None
+    if settings["checkpoint_dir"]:
+        # 断点文件不能被多个进程同时写入，每个任务使用单独的子目录
+        checkpoint = HarvestCheckpoint(os.path.join(settings["checkpoint_dir"], "{}-{}-{}".format(
+            task["name"], task["start_year"], task["end_year"])))
+    before = METRICS.snapshot()["counters"]
+    start = time.perf_counter()
+    status, error = "ok", None
+    try:
+        harvest_topic(task["topic"], task["start_year"], task["end_year"], task["name"],
+                      client=_worker["client"], store=_worker["store"], checkpoint=checkpoint,
+                      incremental=settings["incremental"],
+                      output_dir=task.get("output_dir", settings["output_dir"]),
+                      output_format=task.get("output_format", settings["output_format"]),
+                      keyword_model=KeywordModel(), index=_worker["index"], dedup=_worker["dedup"],
+                      graph=_worker["graph"])
+    except Exception as e:
+        status, error = type(e).__name__, traceback.format_exc()
+        print(f"Task {task['name']} {task['start_year']}-{task['end_year']} failed: {e}")
+    after = METRICS.snapshot()["counters"]
+    return {
+        "name": task["name"],
+        "topic": task["topic"],
+        "start_year": task["start_year"],
+        "end_year": task["end_year"],
+        "pid": os.getpid(),
+        "status": status,
+        "error": error,
+        "seconds": round(time.perf_counter() - start, 3),
+        "counters": {key: value - before.get(key, 0) for key, value in after.items() if value != before.get(key, 0)},
+    }
+
+
+def consolidate(results, seconds):
+    """把各任务的结果合并为一份运行报告：任务明细、合计计数器和各检索写入的文献数。"""
+    totals = {}
+    written = {}
+    for result in results:
+        for key, value in result["counters"].items():
+            totals[key] = totals.get(key, 0) + value
+        written[result["name"]] = written.get(result["name"], 0) + result["counters"].get("records_written_total", 0)
+    records = totals.get("records_written_total", 0)
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(seconds, 3),
+        "tasks": len(results),
+        "failed": sum(result["status"] != "ok" for result in results),
+        "records_written": records,
+        "records_per_sec": round(records / seconds, 3) if seconds else None,
+        "written_by_job": written,
+        "counters": totals,
+        "results": sorted(results, key=lambda result: (result["name"], result["start_year"])),
+    }
+
+
+def run_batch(settings, jobs):
+    """
+    在进程池中运行全部任务（解析和规范化使用多个 CPU 核），各进程共用一个 NCBI 访问频率额度，
+    结束后保存并返回合并的运行报告。
+    """
+    settings = dict(settings)
+    if not settings["rate_file"]:
+        settings["rate_file"] = RATE_FILE or os.path.join(tempfile.gettempdir(), "ncbi_rate_budget.json")
+    tasks = plan_tasks(jobs, settings["years_per_task"])
+    for task in tasks:
+        os.makedirs(task.get("output_dir", settings["output_dir"]), exist_ok=True)
+    workers = max(1, min(settings["workers"] or 1, len(tasks)))
+    print(f"Running {len(tasks)} tasks for {len(jobs)} queries in {workers} processes...")
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,)) as executor:
+        futures = {executor.submit(run_task, task, settings): task for task in tasks}
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"[{len(results)}/{len(tasks)}] {result['name']} {result['start_year']}-{result['end_year']}: "
+                  f"{result['status']} in {result['seconds']:.1f}s")
+    if settings["graph"]:
+        # 各工作进程只写入作者表，合作矩阵在这里一次更新
+        AuthorGraph(settings["graph"]).save()
+    report = consolidate(results, time.perf_counter() - start)
+
+    report_path = settings["report"]
+    if report_path is None:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        report_path = os.path.join(settings["output_dir"], "batch_report-{}.json".format(timestamp))
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    METRICS.log("batch_harvest", seconds=report["seconds"], tasks=report["tasks"], failed=report["failed"],
+                records_per_sec=report["records_per_sec"], counters=report["counters"], report=report_path)
+    print(f"{report['records_written']} articles written by {report['tasks']} tasks "
+          f"({report['failed']} failed); report saved to {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many PubMed harvests in parallel processes")
+    parser.add_argument("spec", help="job spec (JSON) listing the queries, year ranges and output names")
+    parser.add_argument("--workers", type=int, help="number of worker processes (default: spec or CPU count)")
+    parser.add_argument("--report", help="where to save the consolidated run report")
+    args = parser.parse_args()
+
+    settings, jobs = load_job_spec(args.spec)
+    if args.workers:
+        settings["workers"] = args.workers
+    if args.report:
+        settings["report"] = args.report
+    report = run_batch(settings, jobs)
+    raise SystemExit(1 if report["failed"] else 0)
@@ -0,0 +1,287 @@
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from eutils import EutilsClient, TokenBucket
+from records import ArticleRecord
+from eutils_server import EutilsStandIn, synthetic_article, article_set, INSTITUTIONS, COUNTRIES, LAST_NAMES, WORDS, \
+    JOURNALS
+
+RESULTS_DIR = "benchmark_results"
+
+
+def peak_rss_kb():
+    """当前进程的峰值常驻内存（KB）；没有 resource 模块的平台（Windows）返回 None。"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS 以字节为单位
+
+
+def bench_search(articles=5000, latency=0.02, jitter=0.0, error_rate=0.0, use_history=False, fixture=None):
+    """search_pubmed_all 对本地替身服务的端到端检索：吞吐量和请求数。"""
+    import pubmed
+
+    with EutilsStandIn(articles, fixture, latency, jitter, error_rate) as stand_in:
+        # 替身服务不需要遵守 NCBI 的访问频率限制
+        client = EutilsClient(api_key="", limiter=TokenBucket(10000, capacity=100), base_url=stand_in.base_url)
+        start = time.perf_counter()
+        results = pubmed.search_pubmed_all("benchmark", client=client, use_history=use_history)
+        seconds = time.perf_counter() - start
+        stats = dict(stand_in.stats)
+    return {
+        "articles": len(results),
+        "seconds": seconds,
+        "articles_per_sec": len(results) / seconds,
+        "requests": stats["esearch"] + stats["efetch"],
+        "esearch_requests": stats["esearch"],
+        "efetch_requests": stats["efetch"],
+        "injected_errors": stats["errors"],
+        "bytes": stats["bytes"],
+    }
+
+
+def bench_parse(articles=5000):
+    """efetch XML 的解析速度：只提取字段，以及生成完整的文献信息。"""
+    import pubmed
+    from pubmed_xml import iter_article_elements, extract_fields
+
+    content = article_set(synthetic_article(str(30000000 + i)) for i in range(articles))
+
+    start = time.perf_counter()
+    count = sum(1 for article in iter_article_elements(content) if extract_fields(article))
+    extract_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parsed = sum(1 for _ in pubmed.parse_articles(content))
+    parse_seconds = time.perf_counter() - start
+    return {
+        "articles": parsed,
+        "xml_bytes": len(content),
+        "extract_fields_us_per_article": extract_seconds / count * 1e6,
+        "parse_us_per_article": parse_seconds / parsed * 1e6,
+        "articles_per_sec": parsed / parse_seconds,
+    }
+
+
+def synthetic_affiliations(count, distinct, seed=0):
+    rng = random.Random(seed)
+    pool = ["Department of {}, {}, City {}, {}".format(rng.choice(WORDS), rng.choice(INSTITUTIONS), i,
+                                                      rng.choice(COUNTRIES)) for i in range(distinct)]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def bench_normalize(affiliations=100000, distinct=5000):
+    """单位/国家规范化：逐条调用（带缓存）。"""
+    from normalize import clean_affiliation, extract_country
+
+    values = synthetic_affiliations(affiliations, distinct)
+
+    clean_affiliation.cache_clear()
+    extract_country.cache_clear()
+    start = time.perf_counter()
+    for value in values:
+        clean_affiliation(value)
+        extract_country(value)
+    per_call_seconds = time.perf_counter() - start
+    return {
+        "affiliations": affiliations,
+        "distinct": distinct,
+        "per_call_us_per_affiliation": per_call_seconds / affiliations * 1e6,
+    }
+
+
+def _fresh(value):
+    """返回内容相同的新字符串对象（与 lxml 每次解析都生成新字符串一样）。"""
+    return (value + " ")[:-1]
+
+
+def bench_records(articles=100000, seed=0):
+    """
+    解析结果在内存中的大小（tracemalloc）：ArticleRecord（__slots__ + 字符串驻留）与普通 dict 对比。
+    年份、期刊、作者、单位、国家、关键词每条都是新字符串；标题、摘要和单位原文两种表示共用，不计入。
+    """
+    rng = random.Random(seed)
+    shared = [("Title {}".format(i), " ".join(rng.choices(WORDS, k=150)), rng.choice(INSTITUTIONS))
+              for i in range(articles)]
+    rows = [(str(rng.randint(1990, 2024)), rng.choice(JOURNALS), "{} {}".format(rng.choice(LAST_NAMES), i % 500),
+             rng.choice(INSTITUTIONS), rng.choice(COUNTRIES), ", ".join(rng.sample(WORDS, 5))) for i in range(articles)]
+
+    def values(i):
+        title, abstract, affiliation = shared[i]
+        year, journal, author, university, country, keywords = rows[i]
+        return (i + 1, str(30000000 + i), title, _fresh(year), _fresh(journal), _fresh(author), _fresh(author),
+                affiliation, _fresh(university), _fresh(country), abstract, _fresh(keywords))
+
+    results = {"articles": articles}
+    for name, build in (("dict", lambda i: dict(zip(ArticleRecord.COLUMNS, values(i)))),
+                        ("record", lambda i: ArticleRecord(*values(i)))):
+        tracemalloc.start()
+        built = [build(i) for i in range(articles)]
+        results[name + "_bytes"], _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del built
+    results["bytes_saved"] = results["dict_bytes"] - results["record_bytes"]
+    results["record_to_dict_ratio"] = results["record_bytes"] / results["dict_bytes"]
+    return results
+
+
+def write_analysis_dataset(directory, rows, files, seed=0):
+    """在 directory 中生成 files 个按年份划分的 CSV 数据表，共 rows 行。"""
+    rng = random.Random(seed)
+    for year in range(2024 - files + 1, 2025):
+        df = pd.DataFrame([{
+            "Index": i + 1,
+            "Title": "Title {} {}".format(year, i),
+            "Publication Year": year,
+            "Journal": rng.choice(JOURNALS),
+            "First Author": "{} {}".format(rng.choice(LAST_NAMES), rng.randint(1, 500)),
+            "Corresponding Author": "{} {}".format(rng.choice(LAST_NAMES), rng.randint(1, 500)),
+            "Affiliation": rng.choice(INSTITUTIONS),
+            "University": rng.choice(["Tsinghua", "Peking", "Kyoto", "Oxford", "Unknown Institution"]),
+            "Country": rng.choice(COUNTRIES),
+            "Abstract": " ".join(rng.choices(WORDS, k=150)),
+            "Keywords": ", ".join(rng.sample(WORDS, 5)),
+        } for i in range(rows // files)])
+        df.to_csv(os.path.join(directory, "Benchmark-{}-pubmed_research.csv".format(year)), index=False,
+                  encoding="utf-8-sig")
+
+
+def bench_data_imaging(rows=20000, files=4):
+    """burble.data_imaging：首次统计并绘图、首次统计趋势矩阵，以及没有数据变化时的增量运行。"""
+    import burble
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_analysis_dataset(directory, rows, files)
+
+        start = time.perf_counter()
+        tables, changed = burble.aggregate_directory(directory)
+        aggregate_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        burble.render_charts(tables, directory)
+        render_seconds = time.perf_counter() - start
+
+        # 趋势矩阵的首次统计单独计时，之后的增量运行中频率表和趋势矩阵都已是最新
+        start = time.perf_counter()
+        burble.trend_directory(directory)
+        trend_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        burble.data_imaging(directory)
+        incremental_seconds = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "files": files,
+        "aggregate_seconds": aggregate_seconds,
+        "rows_per_sec": rows / aggregate_seconds,
+        "render_seconds": render_seconds,
+        "trend_seconds": trend_seconds,
+        "incremental_seconds": incremental_seconds,
+    }
+
+
+BENCHMARKS = {
+    "search_pubmed_all": bench_search,
+    "parse": bench_parse,
+    "normalize": bench_normalize,
+    "data_imaging": bench_data_imaging,
+    "records": bench_records,
+}
+
+
+def _run(name, params):
+    result = BENCHMARKS[name](**params)
+    result["peak_rss_kb"] = peak_rss_kb()
+    return result
+
+
+def run_benchmark(name, **params):
+    """在独立的子进程中运行一个基准测试，使峰值内存只反映该测试本身。"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        result = executor.submit(_run, name, params).result()
+    result["params"] = params
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(previous, current):
+    """打印两次运行中各数值指标的变化。"""
+    for name, result in current["results"].items():
+        old = previous["results"].get(name)
+        if old is None:
+            continue
+        print(f"{name}:")
+        for metric, value in result.items():
+            if isinstance(value, (int, float)) and isinstance(old.get(metric), (int, float)) and old[metric]:
+                print(f"  {metric}: {old[metric]:.6g} -> {value:.6g} ({value / old[metric] - 1:+.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a local E-utilities stand-in")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument("--articles", type=int, default=5000, help="articles served / parsed")
+    parser.add_argument("--latency", type=float, default=0.02, help="stand-in response latency (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stand-in responses that fail")
+    parser.add_argument("--use-history", action="store_true", help="use the History Server path in search_pubmed_all")
+    parser.add_argument("--fixture", help="recorded efetch XML to serve instead of synthetic articles")
+    parser.add_argument("--rows", type=int, default=20000, help="rows in the data_imaging dataset")
+    parser.add_argument("--records", type=int, default=100000, help="articles held in memory by the records benchmark")
+    parser.add_argument("--output", help="result file (default: benchmark_results/benchmark-<time>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    params = {
+        "search_pubmed_all": {"articles": args.articles, "latency": args.latency, "jitter": args.jitter,
+                              "error_rate": args.error_rate, "use_history": args.use_history, "fixture": args.fixture},
+        "parse": {"articles": args.articles},
+        "normalize": {},
+        "data_imaging": {"rows": args.rows},
+        "records": {"articles": args.records},
+    }
+    run = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {},
+    }
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name}...")
+        run["results"][name] = run_benchmark(name, **params[name])
+        print(json.dumps(run["results"][name], indent=1))
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, "benchmark-{}.json".format(timestamp))
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=1)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), run)
@@ -1,24 +1,52 @@
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # 非交互式后端：只保存图片，不需要图形界面，可在 Linux 服务器和子进程中运行
 import matplotlib.pyplot as plt
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from wordcloud import WordCloud
 import numpy as np
 import os
+from dataset import OUTPUT_DIR, find_tables, read_table
+from metrics import METRICS
+from aggregate import KEYWORD_STOPWORDS, TABLES_DIR, AggregateIndex, aggregate_table, merge_tables, save_tables
+from text_index import TextIndex
+from trends import (DIMENSIONS, TREND_COLUMNS, TrendIndex, TrendMatrices, emerging_scores, load_trends,
+                    merge_trends, save_trend_tables)
+
+# 词云字体：环境变量 BURBLE_FONT_PATH 指定的字体优先，其次是 Windows 的 Arial，
+# 都不存在时使用 matplotlib 自带的 DejaVu Sans（保证 Linux 上也能运行，且各机器输出一致）
+FONT_CANDIDATES = [
+    os.environ.get("BURBLE_FONT_PATH"),
+    r"C:\Windows\Fonts\arial.ttf",
+    os.path.join(matplotlib.get_data_path(), "fonts", "ttf", "DejaVuSans.ttf"),
+]
+
+# 并行绘图的进程数，可通过环境变量 BURBLE_WORKERS 设置
+RENDER_WORKERS = int(os.environ.get("BURBLE_WORKERS", os.cpu_count() or 1))
+
+def font_path():
+    """返回第一个存在的候选字体。"""
+    for path in FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    raise FileNotFoundError("No usable font found, set BURBLE_FONT_PATH")
 
 def create_folder(folder_path):
     """创建文件夹，如果文件夹已经存在，则不做任何操作"""
     if not os.path.exists(folder_path):
         os.makedirs(folder_path)
 
-def histogram(data,path):
-    # **直方图：对 Publication Year 进行分布统计**
-    data["Publication Year"] = pd.to_numeric(data["Publication Year"], errors='coerce')
+def histogram(year_counts,path):
+    # **直方图：对 Publication Year 进行分布统计（year_counts 为 {年份: 文献数} 频率表）**
+    years = np.array(sorted(year_counts))
+    counts = np.array([year_counts[year] for year in years])
 
     # **直方图：对 Publication Year 进行分布统计**
-    plt.figure(figsize=(16, 6))
+    fig = plt.figure(figsize=(16, 6))
 
-    # 绘制直方图
-    data["Publication Year"].hist(bins=20, color='skyblue', edgecolor='black')
+    # 绘制直方图（按频率表加权，分箱与逐条统计时相同）
+    plt.hist(years, bins=20, weights=counts, color='skyblue', edgecolor='black')
 
     # 设置标题和标签
     plt.title("Publication Year Distribution")
@@ -26,10 +54,10 @@ def histogram(data,path):
     plt.ylabel("Number of Publications")
 
     # 设置x轴的显示范围，确保x轴从最早年份到2024
-    plt.xlim(data["Publication Year"].min() - 1, 2024 + 1)
+    plt.xlim(years.min() - 1, 2024 + 1)
 
     # 调整x轴的标签，防止重叠
-    plt.xticks(range(int(data["Publication Year"].min()), 2025), rotation=45)
+    plt.xticks(range(int(years.min()), 2025), rotation=45)
 
     plt.grid(False)
     # 自动调整布局，避免标签被裁剪
@@ -38,6 +66,7 @@ def histogram(data,path):
     # 保存并展示图像
     plt.savefig(path + "/publication_year_histogram_optimized.png", dpi=300)
     # plt.show()
+    plt.close(fig)  # 及时释放图像，避免批量绘图时内存不断增长
 
 # **气泡图绘制函数**
 def plot_wordcloud_for_phrases(data,column_name, title, save_name):
@@ -54,69 +83,77 @@ def plot_wordcloud_for_phrases(data,column_name, title, save_name):
     ).generate_from_frequencies(word_counts)
 
     # 绘制词云图
-    plt.figure(figsize=(10, 6))
+    fig = plt.figure(figsize=(10, 6))
     plt.imshow(wordcloud, interpolation="bilinear")
     plt.title(title, fontsize=16)
     plt.axis("off")
     plt.tight_layout()
     plt.savefig(save_name)
     # plt.show()
+    plt.close(fig)
 
 # **绘制词云图：关键词需要分词**
 def clean_keywords(keywords_list):
     """
     清洗关键词列表：去掉指定词汇和无用词。
     """
-    # 无用的关键词（不区分大小写）
-    stopwords = {
-        "artificial intelligence", "machine learning", "cell", "cells", "neural networks",
-        "abstract","deep learning","such","based","nanoparticles","nanotechnology","available",
-        "nanomedicine","nanoparticle","analysis","nanomedicines","learning",
-        "artificial neural networks","artificial neural network","using","will","prediction",
-        "were","support vector machine","time","future","effect","properties","care","model",
-        "standards","machine","values","hospital","university","deep","neural network","motion",
-        "algorithm","models","human","been","risk","images","proposed","walking","self","biomaterial",
-        "biomaterials","features","feature","different","studies","gait","computer visions"
-
-    }
-
-    # 转小写并过滤无用词
+    # 转小写并过滤无用词（无用词表见 aggregate.KEYWORD_STOPWORDS）
     cleaned_keywords = [
         keyword.strip()
         for keyword in keywords_list
-        if keyword.strip().lower() not in stopwords and keyword.strip()  # 非空且不在无用词中
+        if keyword.strip().lower() not in KEYWORD_STOPWORDS and keyword.strip()  # 非空且不在无用词中
     ]
 
     return cleaned_keywords
 
 # **绘制词云图：关键词需要分词并清洗**
-def filter_unknown_data(df):
+# 过滤规则：(列, 正则)，列中含有匹配内容的行被去掉
+FILTER_RULES = [
+    ("Country", "Unknown"),
+    ("University", "Unknown"),
+    ("Affiliation", "Unknown"),
+    ("First Author", "Unknown"),
+    ("Corresponding Author", "Unknown"),
+    ("University", "Hospital|University|s College London"),  # 去掉只包含 Hospital 或 University 的行
+]
+
+def contains_mask(column, pattern):
+    """
+    与 column.str.contains(pattern, na=False) 结果相同，但正则只对每个不同的值匹配一次：
+    category 列直接匹配类别，其他列先 factorize 再匹配去重后的值，最后按编码映射回每一行。
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes, uniques = column.cat.codes.to_numpy(), column.cat.categories
+    else:
+        codes, uniques = pd.factorize(column)
+    matches = pd.Series(uniques, dtype=object).str.contains(pattern, na=False).to_numpy(dtype=bool)
+    # 编码 -1 表示缺失值，对应末尾追加的 False
+    return np.append(matches, False)[codes]
+
+def filter_unknown_data(df, verbose=True):
     """
     过滤掉含有 "Unknown" 或 "Hospital" 或 "University" 的数据。
+    所有规则合并为一个布尔掩码一次过滤；数据表中没有的列对应的规则跳过。verbose=True 时打印每条规则命中的行数。
     """
-    filtered_df = df[
-        ~df["Country"].str.contains("Unknown", na=False) &
-        ~df["University"].str.contains("Unknown", na=False) &
-        ~df["Affiliation"].str.contains("Unknown", na=False) &
-        ~df["First Author"].str.contains("Unknown", na=False) &
-        ~df["Corresponding Author"].str.contains("Unknown", na=False) &
-        ~df["University"].str.contains("Hospital|University|s College London", na=False)  # 去掉只包含 Hospital 或 University 的行
-    ]
-    return filtered_df
+    drop = np.zeros(len(df), dtype=bool)
+    report = []
+    for column, pattern in FILTER_RULES:
+        if column not in df:
+            continue
+        mask = contains_mask(df[column], pattern)
+        report.append(f"{column} ~ '{pattern}': {mask.sum()}")
+        drop |= mask
+    if verbose:
+        print(f"Dropped {drop.sum()} of {len(df)} rows ({'; '.join(report)})")
+    return df[~drop]
 
 
 # **绘制词云图**
-def plot_wordcloud(data_column, title, save_name, split_keywords=False, random_state=42):
+def plot_wordcloud(word_counts, title, save_name, random_state=42):
     """
-    根据列绘制词云图，支持对关键词进行分割和清洗。
+    根据预先统计好的频率表（{词: 次数}）绘制词云图。
     """
-    if split_keywords:  # 如果是关键词列
-        all_keywords = data_column.dropna().str.cat(sep=',').split(',')
-        cleaned_keywords = clean_keywords(all_keywords)
-        word_counts = Counter(cleaned_keywords)
-    else:  # 其他列直接统计
-        word_counts = Counter(data_column.dropna().tolist())
-    font_path = r'C:\\Windows\\Fonts\\arial.ttf'
+    word_counts = {str(word): count for word, count in word_counts.items()}
     # 创建词云，固定随机种子确保一致性
     wordcloud = WordCloud(
         width=1000,
@@ -127,48 +164,209 @@ def plot_wordcloud(data_column, title, save_name, split_keywords=False, random_s
         random_state=random_state,  # 固定随机种子
         min_font_size=20,  # 设置最小字体大小
         max_font_size=120,  # 设置最大字体大小
-        font_path=font_path,  # 指定字体路径
+        font_path=font_path(),  # 指定字体路径（见 FONT_CANDIDATES）
         relative_scaling = 0.0 # 禁用相对缩放，所有词汇都使用统一的字体大小比例
 
     ).generate_from_frequencies(word_counts)
 
     # 绘制词云图
-    plt.figure(figsize=(8, 8))
+    fig = plt.figure(figsize=(8, 8))
     plt.imshow(wordcloud, interpolation="bilinear")
     # plt.title(title, fontsize=16)
     plt.axis("off")
     plt.tight_layout()
     plt.savefig(save_name)
     # plt.show()
+    plt.close(fig)
+
+# **趋势图：由 年份 × 取值 的计数矩阵绘制（见 trends.TrendMatrices）**
+TREND_TOP = 10      # 每个维度绘制的取值个数
+TREND_WINDOW = 3    # 新兴程度使用的最近年数
+
+def plot_trend_lines(years, series, title, save_name):
+    """
+    绘制多个取值的逐年占比折线图。
+    :param series: {取值: 每年占当年文献数的比例（与 years 对齐的数组）}
+    """
+    fig = plt.figure(figsize=(16, 6))
+    for value, shares in series.items():
+        plt.plot(years, shares, marker="o", markersize=3, label=value)
+    plt.title(title)
+    plt.xlabel("Year")
+    plt.ylabel("Share of Publications")
+    plt.legend(loc="upper left", fontsize=8)
+    plt.tight_layout()
+    plt.savefig(save_name, dpi=300)
+    plt.close(fig)
 
-def data_imaging(path):
-    for item in os.listdir(path):
-        data_path = os.path.join(path, item)
-        if data_path.split(".")[1] == "csv":
-            data = pd.read_csv(data_path)
-            filtered_data = filter_unknown_data(data)
-            histogram(filtered_data, path)
-
-            # **绘制词云图：非关键词列**
-            columns_to_plot = {
-                "First Author": "First Author",
-                "Corresponding Author": "Corresponding Author",
-                "University": "Affiliation",
-                "Country": "Country",
-            }
-
-            for col, title in columns_to_plot.items():
-                save_name = path + f"/{col.lower().replace(' ', '_')}_wordcloud.png"
-                plot_wordcloud(filtered_data[col], title, save_name)
-                plot_wordcloud(filtered_data["Keywords"], "Keywords WordCloud",
-                               path + "/cleaned_keywords_wordcloud.png",
-                               split_keywords=True)
+def plot_emerging(values, scores, title, save_name):
+    """绘制新兴程度最高的取值的横向条形图（分数最高的在最上面）。"""
+    fig = plt.figure(figsize=(10, 6))
+    plt.barh(list(values)[::-1], list(scores)[::-1], color='skyblue', edgecolor='black')
+    plt.title(title)
+    plt.xlabel("Emerging Score (log2 share ratio)")
+    plt.tight_layout()
+    plt.savefig(save_name, dpi=300)
+    plt.close(fig)
+
+def trend_chart_jobs(trends, path):
+    """
+    根据趋势矩阵生成绘图任务：每个维度一张前 TREND_TOP 个取值的逐年占比折线图和一张新兴程度条形图。
+    任务参数只包含绘图需要的小数组，提交到进程池时不需要传递整个矩阵。
+    """
+    jobs = []
+    if not len(trends.years):
+        return jobs
+    for dimension, column in DIMENSIONS.items():
+        top = trends.top(dimension, TREND_TOP)
+        if not top:
+            print(f"No data for {column} trends, skipping")
+            continue
+        shares = trends.series(dimension, top, share=True)
+        jobs.append((plot_trend_lines, (trends.years, {value: shares[value].to_numpy() for value in top},
+                                        f"{column} Trends", os.path.join(path, f"{dimension}_trends.png"))))
+        emerging = emerging_scores(trends, dimension, window=TREND_WINDOW).head(TREND_TOP)
+        if len(emerging):
+            jobs.append((plot_emerging, (emerging["Value"].tolist(), emerging["Score"].tolist(),
+                                         f"Emerging {column} (last {TREND_WINDOW} years)",
+                                         os.path.join(path, f"emerging_{dimension}.png"))))
+    return jobs
+
+# 绘图需要的列：只读取这些列，不加载 Abstract 等大字段
+ANALYSIS_COLUMNS = ["Publication Year", "First Author", "Corresponding Author", "Affiliation", "University",
+                    "Country", "Keywords"]
+
+# 词云图：频率表名称 -> (标题, 图片文件名)
+WORDCLOUD_CHARTS = {
+    "first_author": ("First Author", "first_author_wordcloud.png"),
+    "corresponding_author": ("Corresponding Author", "corresponding_author_wordcloud.png"),
+    "university": ("Affiliation", "university_wordcloud.png"),
+    "country": ("Country", "country_wordcloud.png"),
+    "keywords": ("Keywords WordCloud", "cleaned_keywords_wordcloud.png"),
+}
+
+def chart_jobs(tables, path):
+    """根据频率表生成绘图任务列表 [(绘图函数, 参数)]，图片保存到 path；空的频率表跳过。"""
+    jobs = []
+    if tables["publication_year"]:
+        jobs.append((histogram, (tables["publication_year"], path)))
+    for name, (title, filename) in WORDCLOUD_CHARTS.items():
+        if not tables[name]:
+            print(f"No data for {title}, skipping {filename}")
+            continue
+        jobs.append((plot_wordcloud, (tables[name], title, os.path.join(path, filename))))
+    return jobs
+
+def run_chart_job(job):
+    """执行一个绘图任务（在子进程中运行，函数和参数都可以被 pickle）。"""
+    function, args = job
+    function(*args)
+
+def render_charts(tables, path, executor=None, trends=None):
+    """
+    根据频率表绘制直方图和全部词云图，trends 不为 None 时同时绘制趋势图（见 trend_chart_jobs）。
+    executor 为进程池时只提交任务并返回 future 列表，否则在当前进程中依次绘制。
+    """
+    jobs = (chart_jobs(tables, path) if tables is not None else []) + \
+        (trend_chart_jobs(trends, path) if trends is not None else [])
+    METRICS.inc("charts_total", len(jobs))
+    if executor is None:
+        with METRICS.stage("render"):
+            for job in jobs:
+                run_chart_job(job)
+        return []
+    return [executor.submit(run_chart_job, job) for job in jobs]
+
+def load_analysis_table(table_path):
+    # 读取一个数据表（CSV 文件或 Parquet 年份分区）中绘图需要的列，并过滤掉未知数据
+    return filter_unknown_data(read_table(table_path, columns=ANALYSIS_COLUMNS))
+
+def aggregate_directory(path):
+    """
+    统计一个数据目录，返回 (频率表, 是否有变化)。
+    只读取新增或内容变化的数据表，其余数据表使用索引中保存的部分频率表（见 aggregate.AggregateIndex）。
+    """
+    tables, changed = AggregateIndex(path).update(find_tables(path), load_analysis_table)
+    if changed:
+        tables_dir = save_tables(tables, path)
+        print(f"Frequency tables saved to {tables_dir}")
+    return tables, changed
+
+def trend_directory(path):
+    """
+    增量更新一个数据目录的趋势矩阵（年份 × 关键词/国家/期刊），返回 (趋势矩阵, 是否有变化)。
+    只读取新增或变化的数据表（见 trends.TrendIndex），有变化时保存各维度的趋势表。
+    """
+    trends, changed = TrendIndex(path).update(find_tables(path),
+                                               lambda table_path: read_table(table_path, columns=TREND_COLUMNS))
+    if changed:
+        save_trend_tables(trends, path)
+    return trends, changed
+
+def data_imaging(path, executor=None, force=False):
+    # 统计一个数据目录并绘图（参数 executor 同 render_charts），返回 (频率表, future 列表)；
+    # 数据没有变化时不重新绘图，force=True 时总是重新绘图
+    with METRICS.run("data_imaging", path=path):
+        tables, changed = aggregate_directory(path)
+        trends, trends_changed = trend_directory(path)
+        if not changed and not trends_changed and not force:
+            print(f"No changes in {path}, skipping charts.")
+            return tables, []
+        return tables, render_charts(tables, path, executor, trends)
+
+def query_imaging(index, query, path, executor=None, **filters):
+    """
+    只分析本地全文索引中匹配查询的文献（见 text_index.TextIndex.search，filters 为 dataset、start_year、end_year），
+    不需要重新检索或导出数据集：匹配的文献直接统计，频率表和图表保存到 path，返回 (频率表, future 列表)。
+    """
+    with METRICS.run("query_imaging", query=query, path=path):
+        doc_ids = index.search(query, **filters)
+        print(f"{len(doc_ids)} articles match {query!r}")
+        df = index.to_dataframe(doc_ids, columns=ANALYSIS_COLUMNS + ["Journal"])
+        tables = aggregate_table(filter_unknown_data(df))
+        trends = TrendMatrices.from_frame(df)
+        create_folder(path)
+        save_tables(tables, path)
+        save_trend_tables(trends, path)
+        return tables, render_charts(tables, path, executor, trends)
 
 
 if __name__ == "__main__":
-    path = r"C:\Users\ZMS\Desktop\pubmed"
-    for item in os.listdir(path):
-        data_imaging(os.path.join(path,item))
+    path = OUTPUT_DIR  # 可通过环境变量 PUBMED_OUTPUT_DIR 设置
+    FORCE = False  # True 时忽略索引，重新绘制全部图表
+    # 设置 QUERY（例如 "transformer AND segmentation"）时只分析全文索引中匹配的文献，图表保存到 QUERY_OUTPUT_DIR
+    INDEX_PATH = "pubmed_index.sqlite"
+    QUERY = None
+    QUERY_OUTPUT_DIR = os.path.join(path, "query")
+    if QUERY:
+        with ProcessPoolExecutor(max_workers=RENDER_WORKERS) as executor:
+            _, futures = query_imaging(TextIndex(INDEX_PATH), QUERY, QUERY_OUTPUT_DIR, executor)
+            for future in as_completed(futures):
+                future.result()
+        raise SystemExit
+    # 各数据目录依次增量统计，有变化的目录的绘图任务分发到进程池并行执行
+    with ProcessPoolExecutor(max_workers=RENDER_WORKERS) as executor:
+        futures = []
+        directory_tables = []
+        directory_trends = []
+        for item in os.listdir(path):
+            directory = os.path.join(path, item)
+            # 汇总表目录、查询结果目录（QUERY_OUTPUT_DIR）和没有数据表的目录都不是数据集
+            if not os.path.isdir(directory) or item == TABLES_DIR or directory == QUERY_OUTPUT_DIR \
+                    or not find_tables(directory):
+                continue
+            tables, jobs = data_imaging(directory, executor, force=FORCE)
+            directory_tables.append(tables)
+            directory_trends.append(load_trends(directory))  # data_imaging 已更新缓存的矩阵
+            futures += jobs
+        # 全部目录的汇总频率表由各目录的频率表合并得到
+        save_tables(merge_tables(directory_tables), path)
+        # 全部数据集的趋势矩阵由各目录的矩阵合并得到，跨数据集比较的趋势图保存在 path 中
+        trends = merge_trends(directory_trends)
+        save_trend_tables(trends, path)
+        futures += render_charts(None, path, executor, trends)
+        for future in as_completed(futures):
+            future.result()  # 子进程中的异常在这里抛出
 
 
 
@@ -0,0 +1,103 @@
+import datetime
+import hashlib
+import json
+import os
+
+
+def _unit_key(query, date_range=None):
+    """一个检索单元由检索式（含年份条件）和可选的收录日期范围唯一确定。"""
+    if date_range:
+        return f"{query}|{date_range[0]}-{date_range[1]}"
+    return query
+
+
+class HarvestCheckpoint:
+    """
+    检索断点：记录已完成的检索单元、进行中单元已完成的页，以及每个检索主题上次更新到的日期。
+    state.json 保存单元完成情况和增量日期；进行中单元的每一页解析结果追加写入 pages/<单元哈希>.jsonl，
+    中断后重新运行时这些页直接从文件读取，不再下载。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.state_path = os.path.join(directory, "state.json")
+        self.pages_dir = os.path.join(directory, "pages")
+        os.makedirs(self.pages_dir, exist_ok=True)
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+        else:
+            self.state = {"done": [], "last_update": {}}
+        self._done = set(self.state["done"])
+
+    def _save(self):
+        # 先写临时文件再替换，避免中断时留下损坏的断点文件
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    def _pages_path(self, key):
+        return os.path.join(self.pages_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".jsonl")
+
+    def is_done(self, query, date_range=None):
+        return _unit_key(query, date_range) in self._done
+
+    def mark_done(self, query, date_range=None):
+        """标记单元完成（结果已导出），并删除该单元的分页记录。"""
+        key = _unit_key(query, date_range)
+        if key not in self._done:
+            self._done.add(key)
+            self.state["done"].append(key)
+            self._save()
+        self.clear_pages(query, date_range)
+
+    def clear_pages(self, query, date_range=None):
+        """删除单元的分页记录。"""
+        pages_path = self._pages_path(_unit_key(query, date_range))
+        if os.path.exists(pages_path):
+            os.remove(pages_path)
+
+    def completed_pages(self, query, retmax, date_range=None):
+        """返回进行中单元已完成的页：{retstart: 该页解析出的文献列表}。"""
+        pages_path = self._pages_path(_unit_key(query, date_range))
+        pages = {}
+        if not os.path.exists(pages_path):
+            return pages
+        with open(pages_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    page = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 中断时写了一半的行
+                if page["retmax"] == retmax:
+                    pages[page["retstart"]] = page["articles"]
+        return pages
+
+    def save_page(self, query, retstart, retmax, articles, date_range=None):
+        """追加保存一页的解析结果（包括每篇文献的作者条目 ArticleRecord.authors）。"""
+        pages_path = self._pages_path(_unit_key(query, date_range))
+        line = json.dumps({"retstart": retstart, "retmax": retmax,
+                           "articles": [dict(article, Authors=getattr(article, "authors", None)) for article in articles]},
+                          ensure_ascii=False)
+        with open(pages_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def next_date_range(self, topic, today=None):
+        """
+        增量更新的收录日期范围：从上次更新日期到今天。
+        该主题从未记录过更新日期时返回 None（需要完整检索）。
+        """
+        last = self.state["last_update"].get(topic)
+        if last is None:
+            return None
+        today = today or datetime.date.today()
+        return last, today.strftime("%Y/%m/%d")
+
+    def set_last_update(self, topic, date=None):
+        """记录主题已更新到的日期（默认今天）。"""
+        date = date or datetime.date.today().strftime("%Y/%m/%d")
+        self.state["last_update"][topic] = date
+        self._save()
@@ -0,0 +1,76 @@
+import glob
+import importlib.util
+import os
+
+import pandas as pd
+
+from writers import CsvChunkWriter, ParquetChunkWriter, DICTIONARY_COLUMNS
+
+# 检索结果的输出目录，可通过环境变量 PUBMED_OUTPUT_DIR 修改
+OUTPUT_DIR = os.environ.get("PUBMED_OUTPUT_DIR", r"C:\Users\ZMS\Desktop\pubmed")
+
+# 读取数据表时，重复度高的列（与 Parquet 字典编码列相同）使用 category 类型，
+# 其余文本列在安装了 pyarrow 时使用 Arrow 字符串类型，比 Python 对象字符串省内存
+STRING_DTYPE = "string[pyarrow]" if importlib.util.find_spec("pyarrow") else object
+
+
+def csv_path(output_dir, name, year):
+    """CSV 格式：每年一个文件，例如 Bio-imaging-2020-pubmed_research.csv。"""
+    return os.path.join(output_dir, "{}-{}-pubmed_research.csv".format(name, year))
+
+
+def parquet_path(output_dir, name, year):
+    """Parquet 格式：按年份分区的目录，例如 Bio-imaging/year=2020/。"""
+    return os.path.join(output_dir, name, "year={}".format(year))
+
+
+def open_writer(output_dir, name, year, output_format="csv", append=False, chunk_size=1000, index=None):
+    """打开某一年的分块写入器；提供 index（text_index.TextIndex）时写入的记录同时加入数据集 name 的全文索引。"""
+    if output_format == "csv":
+        return CsvChunkWriter(csv_path(output_dir, name, year), chunk_size=chunk_size, append=append,
+                              index=index, dataset=name)
+    if output_format == "parquet":
+        return ParquetChunkWriter(parquet_path(output_dir, name, year), chunk_size=chunk_size, append=append,
+                                  index=index, dataset=name)
+    raise ValueError(f"Unknown output format: {output_format}")
+
+
+def find_tables(path):
+    """
+    列出目录中的数据表：每个 CSV 文件，以及每个 Parquet 年份分区（year=XXXX 目录）。
+    path 本身是 Parquet 数据集目录（包含 year=XXXX 子目录）或分区目录时同样适用。
+    """
+    if os.path.isfile(path):
+        return [path]
+    tables = sorted(glob.glob(os.path.join(path, "*.csv")))
+    partitions = sorted(glob.glob(os.path.join(path, "year=*"))) + sorted(glob.glob(os.path.join(path, "*", "year=*")))
+    if not partitions and glob.glob(os.path.join(path, "part-*.parquet")):
+        partitions = [path]
+    return tables + [partition for partition in partitions if os.path.isdir(partition)]
+
+
+def read_table(path, columns=None):
+    """
+    读取一个数据表（CSV 文件或 Parquet 分区目录），只加载 columns 指定的列（文件中不存在的列会被忽略）。
+    DICTIONARY_COLUMNS 以 category 类型读出，其余文本列为 STRING_DTYPE（Index 列除外）。
+    """
+    if path.endswith(".csv"):
+        header = pd.read_csv(path, nrows=0, encoding="utf-8-sig").columns
+        usecols = [column for column in header if columns is None or column in columns]
+        dtype = {column: "category" if column in DICTIONARY_COLUMNS else STRING_DTYPE
+                 for column in usecols if column != "Index"}
+        return pd.read_csv(path, usecols=usecols, dtype=dtype, encoding="utf-8-sig")
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    dataset = pq.ParquetDataset(path, read_dictionary=DICTIONARY_COLUMNS)
+    if columns is not None:
+        columns = [column for column in columns if column in dataset.schema.names]
+    return dataset.read(columns=columns).to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+
+
+def iter_tables(path, columns=None):
+    """逐个读取目录中的数据表，产出 (数据表路径, DataFrame)。"""
+    for table_path in find_tables(path):
+        yield table_path, read_table(table_path, columns)
@@ -0,0 +1,315 @@
+import argparse
+import hashlib
+import re
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from dataset import find_tables, read_table
+from metrics import METRICS
+from text_index import table_dataset, tokenize
+
+SHINGLE_SIZE = 3      # 按连续 3 个词切分 shingle
+NUM_PERM = 128        # MinHash 签名长度
+BANDS = 16            # LSH 分段数（每段 NUM_PERM // BANDS 行），相似度约 (1/BANDS) ** (BANDS/NUM_PERM) 以上的文献才会碰撞
+THRESHOLD = 0.8       # 标题+摘要的估计 Jaccard 相似度达到该值视为近似重复
+TITLE_THRESHOLD = 0.9  # 勘误等声明只比较标题
+# 至少要有这么多个 shingle（即 SHINGLE_SIZE + 2 个词）才计算签名；
+# 占位标题（"[Not Available]."、"No title available"）和很短的标题不足以判断是否重复
+MIN_SHINGLES = 3
+
+# 勘误、更正、撤稿等声明的标题前缀（去掉后与原文标题比较）
+NOTICE_PATTERN = re.compile(
+    r"^\s*(?:erratum|corrigendum|correction|retraction(?: note)?|retracted|expression of concern|"
+    r"publisher'?s? note|addendum)\b[^:]*:\s*", re.IGNORECASE)
+
+# MinHash 使用的哈希函数族：h(x) = (a * x + b) mod 2^64 的高 32 位（a 为奇数），固定种子保证签名可以持久保存
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+
+
+def strip_notice(title):
+    """去掉勘误等声明的标题前缀，返回 (标题, 是否为声明)。"""
+    title = "" if title is None or title != title else str(title)
+    stripped = NOTICE_PATTERN.sub("", title, count=1)
+    return stripped, stripped != title
+
+
+def shingle_hashes(text):
+    """文本的词 shingle 集合（CRC32 哈希，uint32 数组）；不足 SHINGLE_SIZE 个词时整段文本为一个 shingle。"""
+    words = tokenize(text)
+    if not words:
+        return np.empty(0, dtype=np.uint32)
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint32,
+                       count=len(shingles))
+
+
+def minhash(hashes):
+    """shingle 哈希集合的 MinHash 签名（NUM_PERM 个 uint32）；空集合返回 None。"""
+    if len(hashes) == 0:
+        return None
+    with np.errstate(over="ignore"):  # 按 2^64 取模
+        values = _A[:, None] * hashes.astype(np.uint64)[None, :] + _B[:, None]
+    return (values >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+
+def similarity(a, b):
+    """两个签名估计的 Jaccard 相似度。"""
+    return float(np.mean(a == b))
+
+
+def band_buckets(signature, kind):
+    """签名的 LSH 分桶：每段的值哈希为一个 64 位整数（kind 区分标题签名和全文签名）。"""
+    rows = NUM_PERM // BANDS
+    return [int.from_bytes(hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(),
+                                           digest_size=8, person=f"{kind}{band}".encode("ascii")).digest(),
+                           "little", signed=True)
+            for band in range(BANDS)]
+
+
+def record_key(record):
+    """文献的唯一键：PMID，没有 PMID 的旧数据使用标题。"""
+    pmid = record.get("PMID")
+    if pmid is not None and pmid == pmid and str(pmid):
+        return str(pmid)
+    return "title:" + str(record.get("Title"))
+
+
+class NearDuplicateIndex:
+    """
+    持久化的近似重复检测索引（SQLite）：每篇文献保存标题和标题+摘要的 MinHash 签名及其 LSH 分桶，
+    以及它所重复的最早文献（canonical，不是重复时为空）。
+    新文献只与同一分桶中的已有文献比较，不需要两两比较，总耗时与文献数大致成线性。
+    签名和分桶按数据集（输出名称）分开：文献只与同一数据集中的文献比较，不会因为另一个检索已导出同一篇文献而被跳过。
+    """
+
+    def __init__(self, path, threshold=THRESHOLD, title_threshold=TITLE_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.title_threshold = title_threshold
+        self._lock = threading.Lock()
+        # 多个进程（如 batch_harvest.py 的工作进程）共用同一个索引时，最多等待 60 秒写锁
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(signatures)")]
+        if columns and "dataset" not in columns:
+            # 旧版索引的签名不区分数据集，无法判断各自属于哪个数据集，删除后按数据集重新记录
+            print(f"Dropping near-duplicate signatures without dataset names from {path}...")
+            self._conn.executescript("DROP TABLE signatures; DROP TABLE IF EXISTS buckets;")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                dataset TEXT NOT NULL,
+                key TEXT NOT NULL,
+                title TEXT,
+                canonical TEXT,
+                similarity REAL,
+                title_signature BLOB,
+                text_signature BLOB,
+                PRIMARY KEY (dataset, key)
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                dataset TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (dataset, bucket, key)
+            ) WITHOUT ROWID;
+        """)
+
+    def _signatures(self, record):
+        """
+        返回 (标题签名, 全文签名, 是否为声明)。shingle 少于 MIN_SHINGLES 个的文本（占位标题、很短的标题）没有签名，
+        不参与比较。
+        """
+        title, notice = strip_notice(record.get("Title"))
+        abstract = record.get("Abstract")
+        has_abstract = abstract is not None and abstract == abstract and str(abstract).strip() \
+            and str(abstract) != "No abstract available"
+        title_hashes = shingle_hashes(title)
+        title_signature = minhash(title_hashes) if len(title_hashes) >= MIN_SHINGLES else None
+        text_signature = None
+        if has_abstract and not notice:
+            text_hashes = shingle_hashes(title + " " + str(abstract))
+            text_signature = minhash(text_hashes) if len(text_hashes) >= MIN_SHINGLES else None
+        return title_signature, text_signature, notice
+
+    def _bucket_keys(self, dataset, buckets):
+        """数据集中已有文献的分桶：{分桶: [键]}，只读取给定的分桶。"""
+        bucket_keys = {}
+        buckets = list(buckets)
+        for start in range(0, len(buckets), 500):
+            batch = buckets[start:start + 500]
+            for bucket, key in self._conn.execute(
+                    "SELECT bucket, key FROM buckets WHERE dataset = ? AND bucket IN ({})".format(
+                        ",".join("?" * len(batch))), [dataset] + batch):
+                bucket_keys.setdefault(bucket, []).append(key)
+        return bucket_keys
+
+    def _load(self, dataset, keys):
+        """{键: (canonical, 标题签名, 全文签名)}。"""
+        loaded = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            for key, canonical, title_blob, text_blob in self._conn.execute(
+                    "SELECT key, canonical, title_signature, text_signature FROM signatures "
+                    "WHERE dataset = ? AND key IN ({})".format(",".join("?" * len(batch))), [dataset] + batch):
+                loaded[key] = (canonical,
+                               np.frombuffer(title_blob, dtype=np.uint32) if title_blob else None,
+                               np.frombuffer(text_blob, dtype=np.uint32) if text_blob else None)
+        return loaded
+
+    def add(self, records, dataset=""):
+        """
+        检查并记录数据集 dataset 中的一批文献，按输入顺序返回 [(键, 所重复的文献键或 None, 相似度)]。
+        已经记录过的文献返回之前的判断结果；同一批中靠前的文献也参与比较。
+        有摘要的文献比较标题+摘要；没有摘要的文献只有勘误、撤稿等声明才按标题与原文比较，其余不判为重复。
+        """
+        with self._lock, METRICS.stage("dedup"):
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                results = self._add(records, dataset)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        duplicates = sum(canonical is not None for _, canonical, _ in results)
+        METRICS.inc("near_duplicates_total", duplicates)
+        return results
+
+    def _add(self, records, dataset):
+        keys = [record_key(record) for record in records]
+        known = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            known.update((key, (canonical, score)) for key, canonical, score in self._conn.execute(
+                "SELECT key, canonical, similarity FROM signatures WHERE dataset = ? AND key IN ({})".format(
+                    ",".join("?" * len(batch))), [dataset] + batch))
+
+        # 新文献的签名和分桶
+        new = {}
+        for key, record in zip(keys, records):
+            if key in known or key in new:
+                continue
+            title_signature, text_signature, notice = self._signatures(record)
+            title_buckets = band_buckets(title_signature, "t") if title_signature is not None else []
+            text_buckets = band_buckets(text_signature, "x") if text_signature is not None else []
+            new[key] = (record.get("Title"), title_signature, text_signature, notice, title_buckets, text_buckets)
+
+        # 与已有文献碰撞的分桶和候选文献的签名，一次读出
+        bucket_keys = self._bucket_keys(dataset, {bucket for entry in new.values() for bucket in entry[4] + entry[5]})
+        signatures = self._load(dataset, {key for keys in bucket_keys.values() for key in keys})
+        for key, (title, title_signature, text_signature, notice, title_buckets, text_buckets) in new.items():
+            # 有摘要的文献比较标题+摘要；勘误等声明只能比较（去掉前缀的）标题；其余没有摘要的文献不比较，
+            # 否则标题相同的不同文献（社论、"[Not Available]." 等）会被合并
+            if text_signature is not None:
+                own, buckets, threshold, field = text_signature, text_buckets, self.threshold, 2
+            elif notice and title_signature is not None:
+                own, buckets, threshold, field = title_signature, title_buckets, self.title_threshold, 1
+            else:
+                own, buckets, threshold, field = None, [], None, None
+            canonical, score = None, None
+            candidates = {candidate for bucket in buckets for candidate in bucket_keys.get(bucket, ())}
+            for candidate in sorted(candidates):
+                signature = signatures[candidate][field]
+                if signature is None:
+                    continue
+                candidate_score = similarity(own, signature)
+                if candidate_score >= threshold and (score is None or candidate_score > score):
+                    # 指向最早的那篇文献，重复的重复归到同一篇
+                    canonical, score = signatures[candidate][0] or candidate, candidate_score
+
+            known[key] = (canonical, score)
+            signatures[key] = (canonical, title_signature, text_signature)
+            # 本批中靠后的文献也与这篇比较
+            for bucket in title_buckets + text_buckets:
+                bucket_keys.setdefault(bucket, []).append(key)
+            self._conn.execute(
+                "INSERT INTO signatures (dataset, key, title, canonical, similarity, title_signature, text_signature) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (dataset, key, title, canonical, score,
+                 title_signature.tobytes() if title_signature is not None else None,
+                 text_signature.tobytes() if text_signature is not None else None))
+            self._conn.executemany("INSERT OR IGNORE INTO buckets (dataset, bucket, key) VALUES (?, ?, ?)",
+                                   ((dataset, bucket, key) for bucket in title_buckets + text_buckets))
+        return [(key, known[key][0], known[key][1]) for key in keys]
+
+    def duplicates(self):
+        """全部已发现的近似重复：DataFrame（Dataset, Key, Title, Duplicate Of, Similarity）。"""
+        with self._lock:
+            rows = self._conn.execute("SELECT dataset, key, title, canonical, similarity FROM signatures "
+                                      "WHERE canonical IS NOT NULL").fetchall()
+        return pd.DataFrame(rows, columns=["Dataset", "Key", "Title", "Duplicate Of", "Similarity"])
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def drop_near_duplicates(articles, index, dataset="", batch_size=1000):
+    """
+    流水线中的去重阶段（生成器）：按批检查文献，跳过与数据集 dataset 中已记录文献近似重复的文献（勘误、
+    再版的会议论文、标题略有不同的同一研究），其余文献按原顺序产出。
+    """
+    batch = []
+    for article in articles:
+        batch.append(article)
+        if len(batch) >= batch_size:
+            yield from _unique(batch, index, dataset)
+            batch = []
+    if batch:
+        yield from _unique(batch, index, dataset)
+
+
+def _unique(batch, index, dataset):
+    for article, (key, canonical, score) in zip(batch, index.add(batch, dataset)):
+        if canonical is None:
+            yield article
+        else:
+            print(f"Skipping near-duplicate {key} of {canonical} (similarity {score:.2f})")
+
+
+def dedupe_directory(index, path, collapse=False):
+    """
+    检查目录中已导出的数据表（按文件顺序，已记录的文献不再计算签名；各数据集分别比较，见 text_index.table_dataset），
+    返回近似重复的 DataFrame；collapse=True 时把 CSV 数据表中的重复行删除后重写（Parquet 分区只报告）。
+    """
+    found = []
+    for table_path in find_tables(path):
+        df = read_table(table_path)
+        records = df.astype(object).where(df.notna(), None).to_dict("records")
+        results = []
+        for start in range(0, len(records), 1000):
+            results += index.add(records[start:start + 1000], table_dataset(table_path))
+        duplicate = np.array([canonical is not None for _, canonical, _ in results], dtype=bool)
+        for record, (key, canonical, score) in zip(records, results):
+            if canonical is not None:
+                found.append((table_path, key, record.get("Title"), canonical, score))
+        print(f"{table_path}: {duplicate.sum()} near-duplicates")
+        if collapse and duplicate.any() and table_path.endswith(".csv"):
+            kept = df[~duplicate].copy()
+            if "Index" in kept:
+                kept["Index"] = range(1, len(kept) + 1)
+            kept.to_csv(table_path, index=False, encoding="utf-8-sig")
+    return pd.DataFrame(found, columns=["Table", "Key", "Title", "Duplicate Of", "Similarity"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate articles (errata, republished versions)")
+    parser.add_argument("directory", help="directory with exported datasets")
+    parser.add_argument("--index", default="pubmed_dedup.sqlite", help="signature database")
+    parser.add_argument("--collapse", action="store_true", help="remove near-duplicate rows from CSV tables")
+    # 报告不放在数据目录中，否则会被当作数据表统计
+    parser.add_argument("--report", default="near_duplicates.csv", help="CSV report of the near-duplicates found")
+    args = parser.parse_args()
+
+    report = dedupe_directory(NearDuplicateIndex(args.index), args.directory, collapse=args.collapse)
+    report.to_csv(args.report, index=False, encoding="utf-8-sig")
+    print(f"{len(report)} near-duplicates found, report saved to {args.report}")
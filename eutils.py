@@ -0,0 +1,719 @@
+import asyncio
+import email.utils
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from metrics import METRICS
+from pubmed_xml import split_article_set
+
+# E-utilities 服务地址，可通过环境变量 EUTILS_BASE_URL 指向本地替身服务（见 eutils_server.py）
+BASE_URL = os.environ.get("EUTILS_BASE_URL", "https://eutils.ncbi.nlm.nih.gov/entrez/eutils")
+ESEARCH_URL = BASE_URL + "/esearch.fcgi"
+EFETCH_URL = BASE_URL + "/efetch.fcgi"
+EPOST_URL = BASE_URL + "/epost.fcgi"
+
+# NCBI 访问频率限制：无 API key 每秒 3 次，有 API key 每秒 10 次
+RATE_WITHOUT_KEY = 3
+RATE_WITH_KEY = 10
+# 多个进程共用访问频率额度时的令牌桶文件（见 FileTokenBucket），未设置时每个进程单独限流
+RATE_FILE = os.environ.get("NCBI_RATE_FILE")
+
+# HTTP 传输：连接超时和读取超时（秒）、失败重试次数、指数退避的基础等待时间（秒）
+TIMEOUT = (10, 120)
+MAX_RETRIES = 5
+BACKOFF = 1.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+POOL_SIZE = 16  # 连接池大小，不小于并发下载的批次数
+
+# PMID 列表超过这个数量时不放在 GET URL 中：不带缓存时先用 epost 上传到 History Server 再分页 efetch，
+# 带缓存时直接 POST 给 efetch（缓存键是 PMID 列表，不依赖每次都不同的 WebEnv）
+EPOST_THRESHOLD = 1000
+
+# 完整响应的结束标记：缺少结束标记的响应（连接中断导致的截断）会被重试
+COMPLETE_MARKERS = {
+    "esearch": b"</eSearchResult>",
+    "efetch": b"</PubmedArticleSet>",
+    "epost": b"</ePostResult>",
+}
+
+
+class TokenBucket:
+    """令牌桶限流器（线程安全），在发出每个请求前调用 acquire()。"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                time.sleep((1 - self._tokens) / self.rate)
+
+
+def _lock_file(f):
+    """对打开的文件加排他锁（阻塞等待）。"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue  # LK_LOCK 重试 10 次（约 10 秒）后仍未拿到锁
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileTokenBucket:
+    """
+    跨进程共享的令牌桶限流器：令牌数和上次补充的时间保存在文件 path 中，每次读写都加文件锁。
+    多个进程（例如 batch_harvest.py 的各个工作进程）使用同一个文件时，合计的访问频率不超过 rate。
+    """
+
+    def __init__(self, path, rate, capacity=1):
+        self.path = path
+        self.rate = rate
+        self.capacity = capacity
+        self._lock = threading.Lock()  # 同一进程内的线程先在这里排队，减少文件锁竞争
+
+    def _take(self):
+        """尝试取一个令牌：成功返回 0，否则返回需要等待的秒数。"""
+        with open(self.path, "a+b") as f:
+            _lock_file(f)
+            try:
+                f.seek(0)
+                now = time.time()  # 各进程共用的时钟
+                try:
+                    tokens, last = json.loads(f.read())
+                except ValueError:
+                    tokens, last = self.capacity, now  # 新文件
+                tokens = min(self.capacity, tokens + max(0.0, now - last) * self.rate)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+                f.truncate(0)
+                f.write(json.dumps([tokens - 1 if wait == 0 else tokens, now]).encode("ascii"))
+                f.flush()
+                return wait
+            finally:
+                _unlock_file(f)
+
+    def acquire(self):
+        with self._lock:
+            while True:
+                wait = self._take()
+                if wait == 0:
+                    return
+                time.sleep(wait)
+
+
+def default_api_key():
+    """从环境变量 NCBI_API_KEY 读取 API key，没有则返回 None。"""
+    return os.environ.get("NCBI_API_KEY") or None
+
+
+def make_limiter(api_key=None, path=RATE_FILE):
+    """
+    根据是否有 API key 创建符合 NCBI 规定的限流器。
+    :param path: 令牌桶文件；提供时返回跨进程共享的 FileTokenBucket（默认取环境变量 NCBI_RATE_FILE）
+    """
+    rate = RATE_WITH_KEY if api_key else RATE_WITHOUT_KEY
+    if path:
+        return FileTokenBucket(path, rate)
+    return TokenBucket(rate)
+
+
+def parse_esearch(content):
+    """从 esearch XML 中提取 (Count, PMID 列表)。"""
+    text = content.decode("utf-8", errors="replace")
+    count_match = re.search(r"<Count>(\d+)</Count>", text)
+    count = int(count_match.group(1)) if count_match else 0
+    pmids = re.findall(r"<Id>(\d+)</Id>", text)
+    return count, pmids
+
+
+def parse_history(content):
+    """从 usehistory=y 的 esearch（或 epost）XML 中提取 (Count, WebEnv, QueryKey)。"""
+    text = content.decode("utf-8", errors="replace")
+    count_match = re.search(r"<Count>(\d+)</Count>", text)
+    webenv_match = re.search(r"<WebEnv>([^<]+)</WebEnv>", text)
+    key_match = re.search(r"<QueryKey>([^<]+)</QueryKey>", text)
+    count = int(count_match.group(1)) if count_match else 0
+    if not (webenv_match and key_match):
+        return count, None, None
+    return count, webenv_match.group(1), key_match.group(1)
+
+
+def date_params(date_range):
+    """把 (mindate, maxdate) 转为按收录日期（edat）过滤的 esearch 参数，日期格式为 YYYY/MM/DD。"""
+    if not date_range:
+        return {}
+    mindate, maxdate = date_range
+    return {"datetype": "edat", "mindate": mindate, "maxdate": maxdate}
+
+
+class OfflineCacheMiss(LookupError):
+    """离线模式下请求的响应不在缓存中。"""
+
+
+class EutilsError(RuntimeError):
+    """E-utilities 请求失败（不可重试的错误，或重试次数用完）。"""
+
+
+def make_session(pool_size=POOL_SIZE):
+    """创建共享的 HTTP 会话：keep-alive 连接池复用 TCP/TLS 连接，响应使用 gzip 压缩传输。"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+
+def retry_after(response):
+    """解析 Retry-After 响应头（秒数或 HTTP 日期），返回需要等待的秒数；没有时返回 None。"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_complete(endpoint, content):
+    """检查响应是否完整（以该接口文档的结束标签结尾）。"""
+    marker = COMPLETE_MARKERS.get(endpoint)
+    return marker is None or content.rstrip().endswith(marker)
+
+
+class AdaptiveBatchSize:
+    """
+    根据观测到的响应耗时和大小自动调整 efetch 批次大小（线程安全）。
+    按每篇文献的平均耗时和字节数（指数滑动平均）估算，使每个请求约 target_seconds 秒、不超过 max_bytes 字节；
+    每次最多放大一倍，结果限制在 [minimum, maximum] 之间（efetch 单次最多 10000 篇）。
+    """
+
+    def __init__(self, initial=200, minimum=20, maximum=10000, target_seconds=10.0, max_bytes=32 * 2 ** 20):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self._seconds_per_article = None
+        self._bytes_per_article = None
+        self._lock = threading.Lock()
+
+    def observe(self, articles, seconds, size_bytes):
+        """记录一次请求：请求的文献数、网络耗时（秒）和响应字节数。"""
+        if articles <= 0:
+            return
+        with self._lock:
+            seconds_per_article = seconds / articles
+            bytes_per_article = size_bytes / articles
+            if self._seconds_per_article is None:
+                self._seconds_per_article, self._bytes_per_article = seconds_per_article, bytes_per_article
+            else:
+                self._seconds_per_article = 0.5 * self._seconds_per_article + 0.5 * seconds_per_article
+                self._bytes_per_article = 0.5 * self._bytes_per_article + 0.5 * bytes_per_article
+            ideal = min(self.target_seconds / max(self._seconds_per_article, 1e-6),
+                        self.max_bytes / max(self._bytes_per_article, 1.0))
+            self.size = int(max(self.minimum, min(self.maximum, ideal, self.size * 2)))
+
+
+class EutilsClient:
+    """
+    E-utilities 客户端：统一处理 API key、限流和响应缓存。
+    :param api_key: NCBI API key，默认读取环境变量 NCBI_API_KEY
+    :param limiter: 共享的限流器，默认按 API key 创建
+    :param cache: ResponseCache 实例，为 None 时不缓存
+    :param offline: 为 True 时只从缓存读取（忽略过期时间），未命中则抛出 OfflineCacheMiss
+    :param base_url: E-utilities 服务地址，默认 BASE_URL
+    :param session: 共享的 requests.Session，默认创建带连接池的会话（见 make_session）
+    """
+
+    def __init__(self, api_key=None, limiter=None, cache=None, offline=False, base_url=None, session=None,
+                 timeout=TIMEOUT, max_retries=MAX_RETRIES, backoff=BACKOFF):
+        self.api_key = api_key if api_key is not None else default_api_key()
+        self.limiter = limiter if limiter is not None else make_limiter(self.api_key)
+        self.cache = cache
+        self.offline = offline
+        self.esearch_url = ESEARCH_URL if base_url is None else base_url + "/esearch.fcgi"
+        self.efetch_url = EFETCH_URL if base_url is None else base_url + "/efetch.fcgi"
+        self.epost_url = EPOST_URL if base_url is None else base_url + "/epost.fcgi"
+        self.session = session if session is not None else make_session()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._timing = threading.local()
+
+    def last_request_seconds(self):
+        """当前线程最近一次网络请求的耗时（秒，不含限流等待和重试等待）；命中缓存时为 0。"""
+        return getattr(self._timing, "seconds", 0.0)
+
+    def _send(self, method, url, params=None, data=None):
+        """
+        发出请求并返回完整的响应内容。连接错误、超时、429/5xx 和截断的响应按指数退避重试
+        （429/503 带 Retry-After 时按服务器要求等待）；其他错误或重试次数用完时抛出 EutilsError。
+        """
+        endpoint = url.rsplit("/", 1)[-1].replace(".fcgi", "")
+        for attempt in range(self.max_retries + 1):
+            with METRICS.stage("rate_limit"):
+                self.limiter.acquire()
+            delay = None
+            start = time.perf_counter()
+            try:
+                with METRICS.stage("network"):
+                    response = self.session.request(method, url, params=params, data=data, timeout=self.timeout)
+                    content = response.content
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.ContentDecodingError) as e:
+                reason = type(e).__name__
+            else:
+                self._timing.seconds = time.perf_counter() - start
+                METRICS.inc("http_requests_total", endpoint=endpoint, status=response.status_code)
+                METRICS.inc("http_response_bytes_total", len(content), endpoint=endpoint)
+                if response.status_code == 200 and is_complete(endpoint, content):
+                    return content
+                if response.status_code != 200 and response.status_code not in RETRY_STATUS:
+                    raise EutilsError(f"{endpoint} returned HTTP {response.status_code}: {content[:200]!r}")
+                reason = "truncated" if response.status_code == 200 else str(response.status_code)
+                delay = retry_after(response)
+
+            if attempt == self.max_retries:
+                raise EutilsError(f"{endpoint} failed after {attempt + 1} attempts ({reason})")
+            if delay is None:
+                delay = self.backoff * 2 ** attempt + random.uniform(0, self.backoff)
+            METRICS.inc("http_retries_total", endpoint=endpoint, reason=reason)
+            print(f"Retrying {endpoint} in {delay:.1f}s ({reason})...")
+            time.sleep(delay)
+
+    def cached(self, url, params):
+        """缓存中的响应内容，没有缓存或未命中时返回 None。"""
+        if self.cache is None:
+            return None
+        content = self.cache.get(url, params, ignore_ttl=self.offline)
+        if content is not None:
+            METRICS.inc("cache_hits_total", endpoint=url.rsplit("/", 1)[-1].replace(".fcgi", ""))
+            self._timing.seconds = 0.0
+        return content
+
+    def get(self, url, params, post=False):
+        """
+        发出一次 E-utilities 请求（优先读取缓存），返回响应内容（bytes）。
+        post=True 时用 POST 提交参数（例如很长的 id 列表），缓存键与 GET 相同。
+        """
+        content = self.cached(url, params)
+        if content is not None:
+            return content
+        if self.offline:
+            raise OfflineCacheMiss(f"{url} {params}")
+
+        request_params = dict(params, api_key=self.api_key) if self.api_key else params
+        if post:
+            content = self._send("POST", url, data=request_params)
+        else:
+            content = self._send("GET", url, params=request_params)
+        if self.cache is not None:
+            self.cache.put(url, params, content)
+        return content
+
+    def last_fetch(self):
+        """当前线程最近一次 efetch_chunks/efetch_history_chunks 的网络请求：(文献数, 耗时, 字节数)；全部命中缓存时为 None。"""
+        return getattr(self._timing, "fetch", None)
+
+    def post(self, url, data):
+        """发出一次 E-utilities POST 请求（不缓存），返回响应内容（bytes）。"""
+        if self.offline:
+            raise OfflineCacheMiss(f"{url} POST")
+        request_data = dict(data, api_key=self.api_key) if self.api_key else data
+        return self._send("POST", url, data=request_data)
+
+    def esearch(self, term, retstart, retmax, date_range=None):
+        """返回 (Count, PMID 列表)。"""
+        params = {
+            "db": "pubmed",
+            "term": term,
+            "retmax": retmax,
+            "retstart": retstart,
+            "retmode": "xml"
+        }
+        params.update(date_params(date_range))
+        return parse_esearch(self.get(self.esearch_url, params))
+
+    @staticmethod
+    def _efetch_params(pmids):
+        return {
+            "db": "pubmed",
+            "id": ",".join(pmids),
+            "retmode": "xml"
+        }
+
+    def efetch(self, pmids):
+        """
+        按 PMID 列表获取详细记录。超过 EPOST_THRESHOLD 个 PMID 时不放在 GET URL 中：
+        不带缓存时先 epost 再按 WebEnv 获取；带缓存（或离线）时 POST 给 efetch，按 PMID 列表缓存，重新运行时能够命中。
+        """
+        if len(pmids) > EPOST_THRESHOLD and self.cache is None and not self.offline:
+            webenv, query_key = self.epost(pmids)
+            return self.efetch_history(webenv, query_key, 0, len(pmids))
+        return self.get(self.efetch_url, self._efetch_params(pmids), post=len(pmids) > EPOST_THRESHOLD)
+
+    def efetch_chunks(self, chunks):
+        """
+        获取多批 PMID 的详细记录，返回每批一个文档。每批都是固定的缓存单位（缓存键与 efetch(批) 相同）：
+        已缓存的批次直接读取，其余批次合并为一个请求，响应按 PMID 拆回各批后分别缓存。
+        """
+        contents = [self.cached(self.efetch_url, self._efetch_params(chunk)) for chunk in chunks]
+        missing = [i for i, content in enumerate(contents) if content is None]
+        self._timing.fetch = None
+        if not missing:
+            return contents
+        if self.offline:
+            raise OfflineCacheMiss(f"{self.efetch_url} {self._efetch_params(chunks[missing[0]])}")
+        pmids = [pmid for i in missing for pmid in chunks[i]]
+        request_params = self._efetch_params(pmids)
+        if self.api_key:
+            request_params["api_key"] = self.api_key
+        if len(pmids) > EPOST_THRESHOLD:
+            content = self._send("POST", self.efetch_url, data=request_params)
+        else:
+            content = self._send("GET", self.efetch_url, params=request_params)
+        self._timing.fetch = (len(pmids), self.last_request_seconds(), len(content))
+        parts = [content] if len(missing) == 1 else \
+            split_article_set(content, pmid_groups=[chunks[i] for i in missing])
+        for i, part in zip(missing, parts):
+            self.cache.put(self.efetch_url, self._efetch_params(chunks[i]), part)
+            contents[i] = part
+        return contents
+
+    def epost(self, pmids):
+        """用 POST 把 PMID 列表上传到 History Server，返回 (WebEnv, QueryKey)，之后用 efetch_history 分页获取。"""
+        _, webenv, query_key = parse_history(self.post(self.epost_url, {"db": "pubmed", "id": ",".join(pmids)}))
+        if webenv is None:
+            raise EutilsError("epost returned no WebEnv")
+        return webenv, query_key
+
+    def esearch_history(self, term, date_range=None):
+        """只调用一次 esearch，把结果集存到 NCBI History Server，返回 (Count, WebEnv, QueryKey)。"""
+        params = {
+            "db": "pubmed",
+            "term": term,
+            "usehistory": "y",
+            "retmax": 0,
+            "retmode": "xml"
+        }
+        params.update(date_params(date_range))
+        return parse_history(self.get(self.esearch_url, params))
+
+    def efetch_history(self, webenv, query_key, retstart, retmax):
+        """按 WebEnv/query_key 分页获取 History Server 中的结果集。"""
+        params = {
+            "db": "pubmed",
+            "WebEnv": webenv,
+            "query_key": query_key,
+            "retstart": retstart,
+            "retmax": retmax,
+            "retmode": "xml"
+        }
+        return self.get(self.efetch_url, params)
+
+    def efetch_history_chunks(self, webenv, query_key, starts, retmax):
+        """
+        按 WebEnv 获取多个固定大小（retmax 篇）的页，返回每页一个文档。每页都是固定的缓存单位
+        （缓存键与 efetch_history(…, 起始位置, retmax) 相同）：未缓存的页合并为一个请求（从第一个到最后一个未缓存的页），
+        响应按篇数拆回各页后分别缓存。
+        """
+        def page_params(retstart, size=retmax):
+            return {"db": "pubmed", "WebEnv": webenv, "query_key": query_key, "retstart": retstart,
+                    "retmax": size, "retmode": "xml"}
+
+        contents = [self.cached(self.efetch_url, page_params(retstart)) for retstart in starts]
+        missing = [i for i, content in enumerate(contents) if content is None]
+        self._timing.fetch = None
+        if not missing:
+            return contents
+        if self.offline:
+            raise OfflineCacheMiss(f"{self.efetch_url} {page_params(starts[missing[0]])}")
+        span = starts[missing[0]:missing[-1] + 1]
+        size = span[-1] + retmax - span[0]
+        request_params = page_params(span[0], size)
+        if self.api_key:
+            request_params["api_key"] = self.api_key
+        content = self._send("GET", self.efetch_url, params=request_params)
+        self._timing.fetch = (size, self.last_request_seconds(), len(content))
+        parts = [content] if len(span) == 1 else split_article_set(content, sizes=[retmax] * len(span))
+        for offset, part in enumerate(parts):
+            i = missing[0] + offset
+            self.cache.put(self.efetch_url, page_params(starts[i]), part)
+            contents[i] = part
+        return contents
+
+    def fetch_page(self, term, retstart, retmax, pmids=None, date_range=None):
+        """获取一页：先 esearch 拿到 PMID（已知则跳过），再 efetch 详细记录；没有结果时返回 None。"""
+        if pmids is None:
+            _, pmids = self.esearch(term, retstart, retmax, date_range)
+        if not pmids:
+            return None
+        return self.efetch(pmids)
+
+
+async def _in_order(jobs, concurrency):
+    """
+    按顺序执行一组后台任务，同时保持最多 concurrency 个在途，按提交顺序产出 (key, 结果)。
+    :param jobs: (key, 启动函数) 的迭代器，启动函数返回 awaitable；启动函数为 None 的任务直接产出 (key, None)
+    """
+    pending = deque()
+    try:
+        while True:
+            while len(pending) < concurrency:
+                job = next(jobs, None)
+                if job is None:
+                    break
+                key, start = job
+                pending.append((key, start() if start is not None else None))
+            if not pending:
+                break
+            key, future = pending.popleft()
+            yield key, (await future if future is not None else None)
+    finally:
+        for _, future in pending:
+            if future is not None:
+                future.cancel()
+
+
+def _observed(batch, client, articles, content):
+    """把一次 efetch 的耗时和响应大小记录到 batch（AdaptiveBatchSize，可以为 None），返回 content。"""
+    if batch is not None and content is not None:
+        batch.observe(articles, client.last_request_seconds(), len(content))
+    return content
+
+
+def _observe_fetch(batch, client, contents):
+    """把最近一次 *_chunks 调用的网络请求（client.last_fetch()）记录到 batch；全部命中缓存时不记录。返回 contents。"""
+    fetch = client.last_fetch()
+    if batch is not None and fetch is not None:
+        batch.observe(*fetch)
+    return contents
+
+
+def _batches(total, size, batch):
+    """依次产出 (起始位置, 批次大小)；提供 batch 时每一批按生成时的 batch.size 决定（惰性生成）。"""
+    start = 0
+    while start < total:
+        current = batch.size if batch is not None else size
+        yield start, current
+        start += current
+
+
+def _groups(starts, unit, batch, skip=()):
+    """
+    把固定大小（unit 篇）的页依次分组产出（起始位置列表）：每组最多 batch.size // unit 个连续的页，
+    按生成时的 batch.size 决定（惰性生成，batch 为 None 时每组一页）；skip 中的页单独成组。
+    """
+    group = []
+    for start in starts:
+        if start in skip:
+            if group:
+                yield group
+                group = []
+            yield [start]
+            continue
+        group.append(start)
+        if len(group) >= (max(1, batch.size // unit) if batch is not None else 1):
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+async def aiter_pages(term, retmax=200, concurrency=4, client=None, executor=None, use_history=False,
+                      date_range=None, skip=(), batch=None):
+    """
+    异步获取检索结果的所有 efetch 页面，按 retstart 顺序逐页产出 (retstart, XML 内容)。
+    同时最多有 concurrency 个批次在下载；调用方解析当前页时，后续页面仍在后台线程中下载。
+    :param term: 完整的 PubMed 检索式
+    :param retmax: 每页文献数（提供 batch 时忽略，第一页使用当前的 batch.size）
+    :param concurrency: 同时在途的批次数
+    :param client: EutilsClient 实例，默认创建一个不带缓存的客户端
+    :param use_history: 为 True 时只调用一次 esearch（usehistory=y），之后按 WebEnv 分页 efetch
+    :param date_range: (mindate, maxdate)，只检索该收录日期范围内的文献
+    :param skip: 不需要下载的页（retstart 集合，例如断点中已完成的页），这些页产出 (retstart, None)
+    :param batch: AdaptiveBatchSize 实例，提供时按之前请求的耗时和大小自动调整每个请求的文献数。
+                  客户端带缓存时页大小固定为 retmax（缓存单位，重新运行、离线回放时请求参数不变），
+                  只调整每个请求合并的页数；不带缓存时直接调整页大小（页的起始位置随之变化，不能与 skip 一起使用）
+    """
+    if client is None:
+        client = EutilsClient()
+    cached = client.cache is not None
+    if batch is not None and skip and not cached:
+        raise ValueError("adaptive batch sizes cannot be combined with skipped pages")
+    loop = asyncio.get_running_loop()
+    if batch is not None and not cached:
+        retmax = batch.size
+
+    if use_history:
+        count, webenv, query_key = await loop.run_in_executor(executor, client.esearch_history, term, date_range)
+        if not count or webenv is None:
+            return
+        first_pmids = None
+
+        def fetch(retstart, size):
+            return _observed(batch, client, size, client.efetch_history(webenv, query_key, retstart, size))
+
+        def fetch_group(group):
+            return _observe_fetch(batch, client, client.efetch_history_chunks(webenv, query_key, group, retmax))
+    else:
+        # 第一次 esearch 同时给出总数，据此确定需要的页数
+        count, first_pmids = await loop.run_in_executor(executor, client.esearch, term, 0, retmax, date_range)
+        if not first_pmids:
+            return
+
+        def fetch(retstart, size):
+            # 第一页的 PMID 已经拿到，不必再次 esearch
+            pmids = first_pmids if retstart == 0 and size == retmax else None
+            return _observed(batch, client, size, client.fetch_page(term, retstart, size, pmids, date_range))
+
+        def fetch_group(group):
+            # 每页的 PMID 仍按固定的 retstart/retmax 检索（esearch 也能命中缓存），遇到空页为止
+            chunks = []
+            for retstart in group:
+                pmids = first_pmids if retstart == 0 else client.esearch(term, retstart, retmax, date_range)[1]
+                if not pmids:
+                    break
+                chunks.append(pmids)
+            contents = _observe_fetch(batch, client, client.efetch_chunks(chunks)) if chunks else []
+            return contents + [None] * (len(group) - len(chunks))
+
+    if cached:
+        jobs = ((group, None if group[0] in skip else functools.partial(loop.run_in_executor, executor,
+                                                                        fetch_group, group))
+                for group in _groups(range(0, count, retmax), retmax, batch, skip))
+        async for group, contents in _in_order(jobs, concurrency):
+            if contents is None:
+                yield group[0], None
+                continue
+            for retstart, content in zip(group, contents):
+                if content is None:
+                    return
+                yield retstart, content
+        return
+
+    def job(retstart, size):
+        if retstart in skip:
+            return retstart, None
+        return retstart, lambda: loop.run_in_executor(executor, fetch, retstart, size)
+
+    # 按已知总数生成所有页的起始位置，不再需要空页来判断结束
+    jobs = (job(retstart, size) for retstart, size in _batches(count, retmax, batch))
+    async for retstart, content in _in_order(jobs, concurrency):
+        if retstart in skip:
+            yield retstart, None
+            continue
+        if content is None:
+            break
+        yield retstart, content
+
+
+async def aiter_efetch(pmids, batch_size=200, concurrency=4, client=None, executor=None, batch=None):
+    """
+    按 PMID 列表分批并发 efetch，按顺序产出 (批次起始位置, XML 内容)。
+    客户端带缓存时每批固定 batch_size 个 PMID（缓存单位，缓存键是 PMID 列表），batch 只决定每个请求合并几批；
+    不带缓存时 PMID 超过 EPOST_THRESHOLD 个先 epost 到 History Server，再按 WebEnv 分页 efetch。
+    :param batch: AdaptiveBatchSize 实例，提供时按之前请求的耗时和大小自动调整每个请求的 PMID 数
+                  （不带缓存时直接调整批次大小，忽略 batch_size）
+    """
+    if client is None:
+        client = EutilsClient()
+    loop = asyncio.get_running_loop()
+
+    if client.cache is not None:
+        def fetch_group(group):
+            chunks = [pmids[start:start + batch_size] for start in group]
+            return _observe_fetch(batch, client, client.efetch_chunks(chunks))
+
+        jobs = ((group, functools.partial(loop.run_in_executor, executor, fetch_group, group))
+                for group in _groups(range(0, len(pmids), batch_size), batch_size, batch))
+        async for group, contents in _in_order(jobs, concurrency):
+            for start, content in zip(group, contents):
+                yield start, content
+        return
+
+    if len(pmids) > EPOST_THRESHOLD:
+        webenv, query_key = await loop.run_in_executor(executor, client.epost, pmids)
+
+        def fetch(start, size):
+            return _observed(batch, client, size, client.efetch_history(webenv, query_key, start, size))
+    else:
+        def fetch(start, size):
+            return _observed(batch, client, size, client.efetch(pmids[start:start + size]))
+
+    jobs = ((start, functools.partial(loop.run_in_executor, executor, fetch, start, size))
+            for start, size in _batches(len(pmids), batch_size, batch))
+    async for start, content in _in_order(jobs, concurrency):
+        yield start, content
+
+
+def _iter_sync(make_agen, concurrency):
+    """在独立的事件循环中驱动异步生成器，转为普通的同步生成器。"""
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    agen = make_agen(executor)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+        # 提前结束（break 或异常）时内层的 _in_order 异步生成器还没有结束，关闭事件循环之前先让它们完成清理
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        executor.shutdown(wait=False, cancel_futures=True)
+        loop.close()
+
+
+def iter_pages(term, retmax=200, concurrency=4, client=None, use_history=False, date_range=None, skip=(),
+               batch=None):
+    """aiter_pages 的同步版本，供普通脚本直接 for 循环使用。"""
+    return _iter_sync(lambda executor: aiter_pages(term, retmax, concurrency, client, executor, use_history,
+                                                   date_range, skip, batch), concurrency)
+
+
+def iter_efetch(pmids, batch_size=200, concurrency=4, client=None, batch=None):
+    """aiter_efetch 的同步版本。"""
+    return _iter_sync(lambda executor: aiter_efetch(pmids, batch_size, concurrency, client, executor, batch),
+                      concurrency)
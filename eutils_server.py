@@ -0,0 +1,229 @@
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+from pubmed_xml import iter_article_elements
+
+# 合成文献使用的素材
+JOURNALS = ["Radiology", "Medical image analysis", "IEEE transactions on medical imaging", "Scientific reports",
+            "Nanomedicine", "Journal of biomedical optics", "European radiology", "Physics in medicine and biology"]
+INSTITUTIONS = ["Tsinghua University", "Peking University", "Harvard Medical School", "University of Oxford",
+                "Mayo Clinic", "Shanghai Jiao Tong University", "Kyoto University", "Imperial College London",
+                "Technical University of Munich", "Seoul National University Hospital"]
+COUNTRIES = ["China", "USA", "United Kingdom", "Germany", "Japan", "Republic of Korea", "P. R. China", "France"]
+LAST_NAMES = ["Wang", "Li", "Zhang", "Smith", "Müller", "Tanaka", "Kim", "Garcia", "Rossi", "Dubois"]
+FORE_NAMES = ["Wei", "Jing", "John", "Anna", "Hiroshi", "Min-Jun", "Maria", "Luca", "Claire", "Tom"]
+WORDS = ["imaging", "segmentation", "tumor", "convolutional", "network", "retina", "lesion", "detection",
+         "classification", "ultrasound", "tomography", "radiomics", "nanoparticles", "delivery", "accuracy",
+         "patients", "cohort", "validation", "features", "microscopy", "diagnosis", "prognosis", "signal"]
+
+
+def synthetic_article(pmid, seed=0):
+    """按 PMID 确定性地生成一篇 PubmedArticle XML（bytes），字段结构与真实 efetch 返回一致。"""
+    rng = random.Random(seed * 1000003 + int(pmid))
+    year = rng.randint(1990, 2024)
+    authors = []
+    for position in range(rng.randint(1, 8)):
+        affiliation = "Department of Radiology, {}, City {}, {}. author{}@example.org".format(
+            rng.choice(INSTITUTIONS), rng.randint(1, 50), rng.choice(COUNTRIES), position)
+        authors.append(
+            '<Author ValidYN="Y"><LastName>{}</LastName><ForeName>{}</ForeName>'
+            '<AffiliationInfo><Affiliation>{}</Affiliation></AffiliationInfo></Author>'.format(
+                escape(rng.choice(LAST_NAMES)), escape(rng.choice(FORE_NAMES)), escape(affiliation)))
+    abstract = "".join(
+        '<AbstractText Label="{}">{}.</AbstractText>'.format(label, " ".join(rng.choices(WORDS, k=rng.randint(30, 80))))
+        for label in ("BACKGROUND", "METHODS", "RESULTS"))
+    keywords = ""
+    if rng.random() < 0.5:
+        keywords = "<KeywordList>{}</KeywordList>".format(
+            "".join("<Keyword>{}</Keyword>".format(word) for word in rng.sample(WORDS, 4)))
+    xml = (
+        "<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article>"
+        "<Journal><JournalIssue><PubDate><Year>{year}</Year><Month>Jan</Month></PubDate></JournalIssue>"
+        "<Title>{journal}</Title></Journal>"
+        "<ArticleTitle>{title}</ArticleTitle><Abstract>{abstract}</Abstract>"
+        "<AuthorList>{authors}</AuthorList></Article>{keywords}</MedlineCitation></PubmedArticle>"
+    ).format(pmid=pmid, year=year, journal=escape(rng.choice(JOURNALS)),
+             title=" ".join(rng.choices(WORDS, k=10)).capitalize() + " ({})".format(pmid),
+             abstract=abstract, authors="".join(authors), keywords=keywords)
+    return xml.encode("utf-8")
+
+
+def load_fixture(path):
+    """读取录制的 efetch XML 文件，返回 {PMID: PubmedArticle XML}（按文件中的顺序）。"""
+    with open(path, "rb") as f:
+        content = f.read()
+    articles = {}
+    for article in iter_article_elements(content):
+        articles[article.findtext(".//PMID")] = etree.tostring(article)
+    return articles
+
+
+def article_set(articles):
+    """把若干 PubmedArticle XML 拼成 efetch 的返回文档。"""
+    return b'<?xml version="1.0" ?>\n<PubmedArticleSet>' + b"".join(articles) + b"</PubmedArticleSet>"
+
+
+class EutilsStandIn:
+    """
+    本地 E-utilities 替身服务（esearch.fcgi / efetch.fcgi / epost.fcgi），在后台线程中运行。
+    返回录制的（fixture）或按 PMID 合成的文献，不区分检索式，也不处理日期条件；
+    支持固定延迟加随机抖动，以及按比例注入错误响应（429 带 Retry-After、500、503）。
+    stats 记录各接口的请求数、错误数和返回的字节数。
+    :param n_articles: 合成文献数（提供 fixture 时忽略）
+    :param fixture: 录制的 efetch XML 文件路径
+    """
+
+    def __init__(self, n_articles=1000, fixture=None, latency=0.0, jitter=0.0, error_rate=0.0, seed=0,
+                 host="127.0.0.1", port=0):
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        if fixture is not None:
+            self._articles = load_fixture(fixture)
+            self.pmids = list(self._articles)
+        else:
+            self._articles = {}
+            self.pmids = [str(30000000 + i) for i in range(n_articles)]
+        self._known = set(self.pmids)
+        self._posted = {}  # epost 上传的 PMID 列表：WebEnv -> PMID 列表
+        self.stats = {"esearch": 0, "efetch": 0, "epost": 0, "errors": 0, "bytes": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), type("Handler", (_Handler,), {"stand_in": self}))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def article(self, pmid):
+        with self._lock:
+            if pmid not in self._articles:
+                self._articles[pmid] = synthetic_article(pmid, self.seed)
+            return self._articles[pmid]
+
+    def esearch(self, params):
+        retstart = int(params.get("retstart", 0))
+        retmax = int(params.get("retmax", 20))
+        if params.get("usehistory") == "y":
+            body = "<eSearchResult><Count>{}</Count><QueryKey>1</QueryKey><WebEnv>STANDIN_WEBENV</WebEnv>" \
+                   "</eSearchResult>".format(len(self.pmids))
+        else:
+            ids = "".join("<Id>{}</Id>".format(pmid) for pmid in self.pmids[retstart:retstart + retmax])
+            body = "<eSearchResult><Count>{}</Count><RetMax>{}</RetMax><RetStart>{}</RetStart><IdList>{}</IdList>" \
+                   "</eSearchResult>".format(len(self.pmids), retmax, retstart, ids)
+        return body.encode("utf-8")
+
+    def efetch(self, params):
+        if "id" in params:
+            pmids = [pmid for pmid in params["id"].split(",") if pmid in self._known]
+        else:
+            retstart = int(params.get("retstart", 0))
+            with self._lock:
+                pmids = self._posted.get(params.get("WebEnv"), self.pmids)
+            pmids = pmids[retstart:retstart + int(params.get("retmax", 20))]
+        return article_set(self.article(pmid) for pmid in pmids)
+
+    def epost(self, params):
+        pmids = [pmid for pmid in params.get("id", "").split(",") if pmid in self._known]
+        with self._lock:
+            webenv = "STANDIN_EPOST_{}".format(len(self._posted) + 1)
+            self._posted[webenv] = pmids
+        return "<ePostResult><QueryKey>1</QueryKey><WebEnv>{}</WebEnv></ePostResult>".format(webenv).encode("utf-8")
+
+    def respond(self, path, params):
+        """处理一次请求，返回 (状态码, 额外响应头, 内容)。"""
+        endpoint = path.rsplit("/", 1)[-1].replace(".fcgi", "")
+        if endpoint not in ("esearch", "efetch", "epost"):
+            return 404, {}, b"Not found"
+        with self._lock:
+            self.stats[endpoint] += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            error = self._rng.random() < self.error_rate
+            status = self._rng.choice([429, 500, 503]) if error else 200
+        time.sleep(delay)
+        if error:
+            with self._lock:
+                self.stats["errors"] += 1
+            headers = {"Retry-After": "1"} if status == 429 else {}
+            return status, headers, b'{"error":"injected error"}'
+        content = getattr(self, endpoint)(params)
+        with self._lock:
+            self.stats["bytes"] += len(content)
+        return 200, {}, content
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """在当前线程中运行（独立运行时使用）。"""
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    stand_in = None
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self._reply(url.path, parse_qs(url.query))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply(urlparse(self.path).path, parse_qs(body.decode("utf-8")))
+
+    def _reply(self, path, query):
+        params = {key: values[-1] for key, values in query.items()}
+        status, headers, content = self.stand_in.respond(path, params)
+        self.send_response(status)
+        self.send_header("Content-Type", "text/xml" if status == 200 else "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass  # 不打印每个请求
+
+
+if __name__ == "__main__":
+    # 独立运行：python eutils_server.py --articles 20000 --latency 0.1，
+    # 然后设置环境变量 EUTILS_BASE_URL=http://127.0.0.1:8080 运行检索脚本
+    parser = argparse.ArgumentParser(description="Local E-utilities stand-in server")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--articles", type=int, default=10000, help="number of synthetic articles")
+    parser.add_argument("--fixture", help="recorded efetch XML file to serve instead of synthetic articles")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an error")
+    args = parser.parse_args()
+
+    stand_in = EutilsStandIn(args.articles, args.fixture, args.latency, args.jitter, args.error_rate, port=args.port)
+    print(f"Serving {len(stand_in.pmids)} articles at {stand_in.base_url}")
+    try:
+        stand_in.serve_forever()
+    except KeyboardInterrupt:
+        stand_in.stop()
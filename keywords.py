@@ -0,0 +1,150 @@
+import os
+import re
+
+import numpy as np
+from scipy import sparse
+
+from metrics import METRICS
+
+TOKEN_PATTERN = re.compile(r"\b[a-zA-Z]{4,}\b")  # 只提取长度 >= 4 的单词
+
+# 停用词：英文常用虚词和检索主题本身的高频词（不会作为关键词）
+STOPWORDS = frozenset([
+    "about", "above", "after", "again", "against", "also", "although", "among", "another", "because", "been",
+    "before", "being", "below", "between", "both", "could", "does", "doing", "down", "during", "each", "either",
+    "even", "every", "from", "further", "have", "having", "here", "however", "into", "itself", "just", "many",
+    "more", "most", "much", "must", "neither", "once", "only", "other", "ours", "over", "same", "several",
+    "should", "since", "some", "such", "than", "that", "their", "theirs", "them", "themselves", "then", "there",
+    "therefore", "these", "they", "this", "those", "through", "thus", "under", "until", "upon", "very", "were",
+    "what", "when", "where", "whereas", "whether", "which", "while", "will", "with", "within", "without", "would",
+    "your", "yours", "high", "data", "research", "study", "results", "using", "used", "based", "show", "shows",
+    "shown", "method", "methods", "machine", "learning", "deep", "artificial", "intelligence"
+])
+
+
+def tokenize(text):
+    """小写化并切分出长度 >= 4 的英文单词，去掉停用词。"""
+    if not text:
+        return []
+    return [word for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+
+
+class KeywordModel:
+    """
+    语料级 TF-IDF 关键词模型。
+    一批文档只切词一次，构建稀疏的文档-词矩阵（CSR），再以向量化方式计算每篇文档 TF-IDF 最高的 k 个词。
+    词表和文档频率可以随新文献增量更新（partial_fit），并可保存到磁盘供下次运行继续使用。
+    """
+
+    def __init__(self):
+        self.terms = []  # 词 id -> 词
+        self.vocabulary = {}  # 词 -> 词 id
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+        self.n_documents = 0
+
+    def _document_term_matrix(self, texts, grow):
+        """构建文档-词计数矩阵；grow=True 时把新词加入词表，否则忽略未登录词。"""
+        rows, cols = [], []
+        for row, text in enumerate(texts):
+            for word in tokenize(text):
+                term_id = self.vocabulary.get(word)
+                if term_id is None:
+                    if not grow:
+                        continue
+                    term_id = self.vocabulary[word] = len(self.terms)
+                    self.terms.append(word)
+                rows.append(row)
+                cols.append(term_id)
+        data = np.ones(len(rows), dtype=np.float64)
+        matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(texts), len(self.terms)))
+        matrix.sum_duplicates()
+        return matrix
+
+    def partial_fit(self, texts):
+        """用一批新文档更新词表和文档频率，返回这批文档的文档-词计数矩阵。"""
+        matrix = self._document_term_matrix(texts, grow=True)
+        document_frequency = np.zeros(len(self.terms), dtype=np.int64)
+        document_frequency[:len(self.document_frequency)] = self.document_frequency
+        document_frequency += np.bincount(matrix.indices, minlength=len(self.terms))
+        self.document_frequency = document_frequency
+        self.n_documents += len(texts)
+        return matrix
+
+    def transform(self, texts):
+        """按现有词表构建文档-词计数矩阵（不更新模型）。"""
+        return self._document_term_matrix(texts, grow=False)
+
+    def idf(self):
+        """平滑后的 IDF：log((1 + N) / (1 + df)) + 1。"""
+        return np.log((1 + self.n_documents) / (1 + self.document_frequency)) + 1
+
+    def top_keywords(self, matrix, k=5):
+        """
+        对文档-词计数矩阵的每一行取 TF-IDF 最高的 k 个词，返回每篇文档的词列表。
+        分数相同时按词首次进入词表的顺序排列。
+        """
+        matrix = matrix.tocsr()
+        n_rows = matrix.shape[0]
+        idf = self.idf()
+        scores = matrix.data * idf[matrix.indices]
+        rows = np.repeat(np.arange(n_rows), np.diff(matrix.indptr))
+
+        # 按 (行, 分数降序, 词 id) 排序后，每行的前 k 个即为该行的关键词
+        order = np.lexsort((matrix.indices, -scores, rows))
+        ranks = np.arange(len(order)) - matrix.indptr[rows[order]]
+        selected = order[ranks < k]
+
+        terms = np.asarray(self.terms, dtype=object)
+        selected_rows = rows[selected]
+        bounds = np.searchsorted(selected_rows, np.arange(n_rows + 1))
+        selected_terms = terms[matrix.indices[selected]]
+        return [list(selected_terms[bounds[row]:bounds[row + 1]]) for row in range(n_rows)]
+
+    def save(self, path):
+        np.savez_compressed(path, terms=np.array(self.terms, dtype=str),
+                            document_frequency=self.document_frequency, n_documents=self.n_documents)
+
+    @classmethod
+    def load(cls, path):
+        """读取已保存的模型；文件不存在时返回空模型。"""
+        model = cls()
+        if not os.path.exists(path):
+            return model
+        with np.load(path) as saved:
+            model.terms = saved["terms"].tolist()
+            model.document_frequency = saved["document_frequency"]
+            model.n_documents = int(saved["n_documents"])
+        model.vocabulary = {term: term_id for term_id, term in enumerate(model.terms)}
+        return model
+
+
+def fill_keywords(articles, model, k=5, batch_size=1000):
+    """
+    关键词批处理阶段（生成器）：在检索、解析之后按批处理文献流。
+    每批文献的摘要先用于增量更新词表和 IDF，再为 Keywords 为 None 的文献填入 TF-IDF 最高的 k 个词；
+    没有摘要的文献填入 "No keywords available"。
+    """
+    batch = []
+    for article in articles:
+        batch.append(article)
+        if len(batch) >= batch_size:
+            yield from _fill_batch(batch, model, k)
+            batch = []
+    if batch:
+        yield from _fill_batch(batch, model, k)
+
+
+def _fill_batch(batch, model, k):
+    with METRICS.stage("keywords"):
+        return _fill_keywords(batch, model, k)
+
+
+def _fill_keywords(batch, model, k):
+    texts = [article["Abstract"] if article["Abstract"] != "No abstract available" else "" for article in batch]
+    matrix = model.partial_fit(texts)
+    missing = [row for row, article in enumerate(batch) if article["Keywords"] is None]
+    if missing:
+        keywords = model.top_keywords(matrix[missing], k)
+        for row, words in zip(missing, keywords):
+            batch[row]["Keywords"] = ", ".join(words) if words else "No keywords available"
+    return batch
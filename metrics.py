@@ -0,0 +1,182 @@
+import cProfile
+import datetime
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# 结构化日志（每次运行结束时一行 JSON）写入的文件，未设置时写到标准错误
+LOG_PATH = os.environ.get("METRICS_LOG")
+# Prometheus textfile（node_exporter textfile collector 读取的 .prom 文件），未设置时不写
+TEXTFILE_PATH = os.environ.get("METRICS_TEXTFILE")
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"'))
+                          for name, value in labels) + "}"
+
+
+class Metrics:
+    """
+    进程内的计数器和分阶段计时器（线程安全）。
+    计数器按 (名称, 标签) 累加，例如 http_requests_total{endpoint="efetch",status="200"}；
+    计时器按阶段（network、parse、normalize、keywords、write、aggregate、render 等）累加耗时和调用次数。
+    所有值都是进程启动以来的累计值；run() 在一次运行结束时输出这次运行的增量。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._stages = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def add_time(self, stage, seconds, calls=1):
+        with self._lock:
+            total, count = self._stages.get(stage, (0.0, 0))
+            self._stages[stage] = (total + seconds, count + calls)
+
+    @contextmanager
+    def stage(self, stage):
+        """统计 with 块的耗时，累加到阶段 stage。"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def timed_iter(self, stage, iterable):
+        """逐个产出 iterable 中的元素，把每次取下一个元素的耗时累加到阶段 stage（用于生成器流水线）。"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(stage, time.perf_counter() - start, calls=0)
+                return
+            self.add_time(stage, time.perf_counter() - start)
+            yield item
+
+    def snapshot(self):
+        """当前累计值：{"counters": {"名称{标签}": 值}, "stages": {阶段: {"seconds": 秒, "calls": 次数}}}。"""
+        with self._lock:
+            counters = {name + _format_labels(labels): value for (name, labels), value in self._counters.items()}
+            stages = {stage: {"seconds": total, "calls": count} for stage, (total, count) in self._stages.items()}
+        return {"counters": counters, "stages": stages}
+
+    def prometheus_text(self):
+        """Prometheus 文本格式的全部累计值。"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            stages = sorted(self._stages.items())
+        lines = []
+        names = set()
+        for (name, labels), value in counters:
+            if name not in names:
+                names.add(name)
+                lines.append(f"# TYPE pubmed_{name} counter")
+            lines.append(f"pubmed_{name}{_format_labels(labels)} {value}")
+        if stages:
+            lines.append("# TYPE pubmed_stage_seconds_total counter")
+            lines += [f'pubmed_stage_seconds_total{{stage="{stage}"}} {total:.6f}' for stage, (total, _) in stages]
+            lines.append("# TYPE pubmed_stage_calls_total counter")
+            lines += [f'pubmed_stage_calls_total{{stage="{stage}"}} {count}' for stage, (_, count) in stages]
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        # 先写临时文件再替换，采集程序不会读到写了一半的文件
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def run(self, name, **fields):
+        """
+        一次运行（例如一次 search_pubmed_all）：结束时输出一行 JSON 日志，包含耗时、本次运行的计数器和阶段耗时增量，
+        以及 records/sec；设置了 TEXTFILE_PATH 时同时更新 Prometheus textfile。
+        """
+        before = self.snapshot()
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException as e:
+            status = type(e).__name__
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            after = self.snapshot()
+            counters = {key: value - before["counters"].get(key, 0) for key, value in after["counters"].items()
+                        if value != before["counters"].get(key, 0)}
+            stages = {}
+            for stage, values in after["stages"].items():
+                old = before["stages"].get(stage, {"seconds": 0.0, "calls": 0})
+                if values["calls"] != old["calls"] or values["seconds"] != old["seconds"]:
+                    stages[stage] = {"seconds": round(values["seconds"] - old["seconds"], 6),
+                                     "calls": values["calls"] - old["calls"]}
+            records = (counters.get("records_parsed_total", 0) or counters.get("records_written_total", 0)
+                       or counters.get("records_aggregated_total", 0))
+            self.log(name, status=status, seconds=round(elapsed, 6),
+                     records_per_sec=round(records / elapsed, 3) if elapsed else None,
+                     counters=counters, stages=stages, **fields)
+            if TEXTFILE_PATH:
+                self.write_textfile(TEXTFILE_PATH)
+
+    def timed_run(self, name):
+        """装饰器：函数的每次调用作为一次运行（见 run）。"""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.run(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def log(self, event, **fields):
+        """输出一行结构化 JSON 日志。"""
+        line = json.dumps(dict(time=datetime.datetime.now().isoformat(timespec="seconds"), event=event, **fields),
+                          ensure_ascii=False)
+        if LOG_PATH:
+            with open(LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        else:
+            print(line, file=sys.stderr)
+
+
+# 全局指标（与 Prometheus 客户端的默认 registry 类似），各模块直接使用
+METRICS = Metrics()
+
+
+@contextmanager
+def profiled(path=None, top=25):
+    """
+    用 cProfile 分析 with 块：结束后打印累计耗时最多的 top 个函数，path 不为 None 时保存 .prof 文件
+    （可用 snakeviz 或 pstats 查看）。
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(top)
+        print(output.getvalue())
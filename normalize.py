@@ -0,0 +1,112 @@
+import re
+from functools import lru_cache
+
+# 同一单位字符串在一次检索中会重复出现成千上万次，结果按原始字符串缓存
+MEMO_SIZE = 65536
+
+# 特殊国家映射表（针对特定写法），排在前面的写法优先
+COUNTRY_VARIANTS = {
+    "Republic of Korea": "South Korea",
+    "Korea": "South Korea",
+    "South Korea": "South Korea",
+    "P. R. China": "China",
+    "P R China": "China",
+    "CHN": "China",
+    "Taiwan": "Chinese Taiwan",
+    "China": "China",
+    "PRC": "China",
+    "People's Republic of China": "China",
+    "USA": "United States",
+    "United States of America": "United States",
+    "UK": "United Kingdom",
+    "England": "United Kingdom",
+    "Saudi Arabia": "Saudi Arabia",
+    "Spain": "Spain",
+    "Australia": "Australia",
+    "Japan": "Japan",
+    "JPN": "Japan",
+    "France": "France",
+    "Germany": "Germany",
+    "Poland": "Poland",
+    "Bangladesh": "Bangladesh",
+    "India": "India",
+    "Italy": "Italy",
+    "Thailand": "Thailand",
+    "Denmark": "Denmark",
+    "Belgium": "Belgium",
+    "Sweden": "Sweden",
+    "Iran": "Iran",
+    "Canada": "Canada",
+    "Egypt": "Egypt",
+    "the Netherlands": "the Netherlands",
+    "Brazil": "Brazil"
+}
+
+EMAIL_PATTERN = re.compile(r"\b\w+@\w+\.\w+\b")
+PUNCTUATION_PATTERN = re.compile(r"[.;]")
+
+# 所有国家写法编译为一个正则：零宽前瞻保证每个位置都尝试匹配（可以找到互相重叠的写法），
+# 同一位置按优先级顺序尝试，因此所有匹配中优先级最高的写法即为结果（与逐个子串查找的结果一致）
+_VARIANTS = list(COUNTRY_VARIANTS)
+_VARIANT_PRIORITY = {variant: priority for priority, variant in enumerate(_VARIANTS)}
+COUNTRY_PATTERN = re.compile("(?=({}))".format("|".join(re.escape(variant) for variant in COUNTRY_VARIANTS)))
+
+# 单位关键词按优先级排列，每个关键词的正则只编译一次
+INSTITUTION_KEYWORDS = ["University", "Hospital", "Institute", "College"]
+KEYWORD_PATTERNS = [re.compile(r"([A-Za-z\s]*?{}[A-Za-z\s]*?)(?=\s*,|\s*$)".format(re.escape(keyword)), re.IGNORECASE)
+                    for keyword in INSTITUTION_KEYWORDS]
+INSTITUTION_PATTERN = re.compile(r"([A-Za-z\s]+(?:University|Institute|Hospital|College)[A-Za-z\s]*)")
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def clean_affiliation(affiliation):
+    """提取通讯单位中的简化名称，按照优先级检索 University, Hospital, Institute, College，并处理多部分单位名称。"""
+    if not affiliation:
+        return "Unknown Institution"
+
+    # 清除附加内容（如电子邮件地址和特殊字符）
+    cleaned_affiliation = EMAIL_PATTERN.sub("", affiliation)
+    cleaned_affiliation = PUNCTUATION_PATTERN.sub("", cleaned_affiliation)
+
+    # 根据优先级顺序，依次查找关键词并提取相关单位名称
+    for pattern in KEYWORD_PATTERNS:
+        match = pattern.search(cleaned_affiliation)
+        if match:
+            # 处理特殊情况：如果单位名包含多个部分，确保提取完整单位名
+            institution_match = INSTITUTION_PATTERN.search(match.group(0).strip())
+            if institution_match:
+                return institution_match.group(0).strip()
+
+    return "Unknown Institution"
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def extract_country(affiliation):
+    """
+    从通讯单位中提取国家信息，去除电子邮件和杂乱信息。
+    先用预编译的多写法正则查找国家写法，找不到时返回最后一个逗号之后的部分。
+    """
+    if not affiliation:
+        return "Unknown Country"
+
+    # 先移除电子邮件地址
+    email_match = EMAIL_PATTERN.search(affiliation)
+    if email_match:
+        affiliation = affiliation.replace(email_match.group(0), "")
+    affiliation = PUNCTUATION_PATTERN.sub("", affiliation).strip()
+
+    best = None
+    for match in COUNTRY_PATTERN.finditer(affiliation):
+        priority = _VARIANT_PRIORITY[match.group(1)]
+        if best is None or priority < best:
+            best = priority
+            if best == 0:
+                break
+    if best is not None:
+        return COUNTRY_VARIANTS[_VARIANTS[best]]
+
+    # 最后一个逗号之后的部分很可能是国家信息
+    parts = affiliation.split(",")
+    if len(parts) > 1:
+        return parts[-1].strip()
+    return "Unknown Country"
@@ -0,0 +1,94 @@
+import calendar
+import datetime
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# esearch 最多只能取回前 9,999 条结果，每个分区的文献数必须在此之内
+ESEARCH_CAP = 9999
+
+# 一个检索分区：出版日期范围 [start, end] 及该范围内的文献数
+Partition = namedtuple("Partition", ["start", "end", "count"])
+
+
+def partition_term(topic, start, end):
+    """生成按出版日期（[DP]）限定范围的检索式。"""
+    return '{} AND ("{}"[DP] : "{}"[DP])'.format(topic, start.strftime("%Y/%m/%d"), end.strftime("%Y/%m/%d"))
+
+
+def split_range(start, end):
+    """把日期范围拆成更细的子范围：跨年按年拆，年内按月拆，月内按天拆；已是单日则返回空列表。"""
+    if start.year != end.year:
+        bounds = [(datetime.date(year, 1, 1), datetime.date(year, 12, 31)) for year in range(start.year, end.year + 1)]
+    elif start.month != end.month:
+        bounds = [(datetime.date(start.year, month, 1),
+                   datetime.date(start.year, month, calendar.monthrange(start.year, month)[1]))
+                  for month in range(start.month, end.month + 1)]
+    elif start != end:
+        bounds = [(start + datetime.timedelta(days=i),) * 2 for i in range((end - start).days + 1)]
+    else:
+        return []
+    # 首尾子范围裁剪到原范围之内
+    return [(max(a, start), min(b, end)) for a, b in bounds]
+
+
+def decade_ranges(start_year, end_year):
+    """按年代（1960–1969、1970–1979……）划分初始范围。"""
+    ranges = []
+    year = start_year
+    while year <= end_year:
+        last = min(year - year % 10 + 9, end_year)
+        ranges.append((datetime.date(year, 1, 1), datetime.date(last, 12, 31)))
+        year = last + 1
+    return ranges
+
+
+def plan_partitions(client, topic, start_year, end_year, query_suffix=" NOT Review[PT]", date_range=None,
+                    cap=ESEARCH_CAP, workers=4):
+    """
+    先查询文献数量，再规划检索分区：
+    - 没有文献的范围直接跳过；
+    - 文献较少的年代合并为一个分区（一次检索）；
+    - 超过 cap 的范围依次按年、月、日递归拆分，直到每个分区都不超过 cap。
+    同一层的计数请求并发发出（仍受 client 的限流器约束）。返回按时间排序的分区列表。
+    :param query_suffix: 与 search_pubmed_all 一致的附加检索条件（排除综述文章）
+    :param date_range: 增量模式的收录日期范围，计数时同样生效
+    """
+
+    def count(bounds):
+        term = partition_term(topic, *bounds) + query_suffix
+        total, _ = client.esearch(term, 0, 0, date_range)
+        return total
+
+    partitions = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        level = decade_ranges(start_year, end_year)
+        while level:
+            next_level = []
+            for bounds, total in zip(level, executor.map(count, level)):
+                if total == 0:
+                    continue
+                children = split_range(*bounds) if total > cap else []
+                if children:
+                    next_level.extend(children)
+                else:
+                    if total > cap:
+                        print(f"Warning: {bounds[0]} has {total} records, only the first {cap} can be retrieved.")
+                    partitions.append(Partition(bounds[0], bounds[1], total))
+            level = next_level
+
+    partitions.sort(key=lambda partition: partition.start)
+    return partitions
+
+
+def partition_year(partition, pub_year):
+    """
+    确定文献归入哪一年的输出文件。
+    单年分区直接取该年；多年合并分区按文献的出版年份归档，年份未知或超出范围时归入最接近的年份。
+    """
+    if partition.start.year == partition.end.year:
+        return partition.start.year
+    match = re.match(r"\d{4}", str(pub_year))
+    if not match:
+        return partition.start.year
+    return min(max(int(match.group(0)), partition.start.year), partition.end.year)
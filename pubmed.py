@@ -1,267 +1,286 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-from collections import Counter
-import re
-
-
-def clean_affiliation(affiliation):
-    """提取通讯单位中的简化名称，按照优先级检索 University, Hospital, Institute, College，并处理多部分单位名称。"""
-    if not affiliation:
-        return "Unknown Institution"
-
-    # 清除附加内容（如电子邮件地址和特殊字符）
-    cleaned_affiliation = re.sub(r"\b\w+@\w+\.\w+\b", "", affiliation)  # 去掉电子邮件
-    cleaned_affiliation = re.sub(r"[.;]", "", cleaned_affiliation)  # 去掉句号和分号
-
-    # 设定优先级的关键词列表
-    keywords = ["University", "Hospital", "Institute", "College"]
-
-    # 根据优先级顺序，依次查找关键词并提取相关单位名称
-    for keyword in keywords:
-        # 创建正则表达式：匹配关键词后面跟随单位名称，直到遇到逗号或文本末尾
-        pattern = r"([A-Za-z\s]*?{}[A-Za-z\s]*?)(?=\s*,|\s*$)".format(re.escape(keyword))
-        match = re.search(pattern, cleaned_affiliation, re.IGNORECASE)
-
-        if match:
-            extracted_name = match.group(0).strip()
-
-            # 处理特殊情况：如果单位名包含多个部分，确保提取完整单位名
-            institution_pattern = r"([A-Za-z\s]+(?:University|Institute|Hospital|College)[A-Za-z\s]*)"
-            institution_match = re.search(institution_pattern, extracted_name)
-
-            if institution_match:
-                return institution_match.group(0).strip()
-
-    # 如果没有找到匹配的单位名称，返回 Unknown Institution
-    return "Unknown Institution"
-
-
-def extract_country(affiliation):
+from eutils import AdaptiveBatchSize, EutilsClient, iter_pages
+from response_cache import ResponseCache
+from normalize import clean_affiliation, extract_country
+from pubmed_xml import iter_article_elements, extract_fields, author_name, author_affiliation, corresponding_author
+from checkpoint import HarvestCheckpoint
+from article_store import ArticleStore, search_fields
+from writers import CsvChunkWriter
+from dataset import OUTPUT_DIR, open_writer
+from planner import plan_partitions, partition_term, partition_year
+from keywords import KeywordModel, fill_keywords
+from records import ArticleRecord
+from metrics import METRICS, profiled
+from text_index import TextIndex
+from dedup import NearDuplicateIndex, drop_near_duplicates
+from authors import AuthorGraph, add_to_graph, author_entries
+import datetime
+import os
+
+
+def build_article(fields, index):
+    """根据 extract_fields 解析出的原始字段生成一条文献信息；字段不完整时抛出异常。"""
+    title = fields["title"] if fields["title"] is not None else "No title available"
+    journal = fields["journal"] if fields["journal"] is not None else "No journal available"
+
+    # 提取年度信息
+    pub_year = fields["pub_year"] if fields["pub_year"] is not None else "Unknown"
+
+    # 获取作者信息
+    authors = fields["authors"]
+    first_author = author_name(authors[0]) if authors else "Unknown"
+    # 通讯作者：单位中带电子邮件地址的作者，没有时为最后一位作者（ValidYN 只表示姓名是否有效）
+    corresponding = corresponding_author(authors)
+    corresponding_name = author_name(corresponding) if corresponding is not None else "Unknown"
+    affiliations = [author_affiliation(author) for author in authors if author_affiliation(author) is not None]
+
+    # 获取通讯单位（取第一个通讯作者的单位）
+    affiliation = affiliations[0] if affiliations else "No affiliation available"
+    with METRICS.stage("normalize"):
+        cleaned_affiliation = clean_affiliation(affiliation)
+        country = extract_country(affiliation)
+        # 全部作者的规范化单位和国家
+        entries = author_entries(authors, corresponding)
+
+    # 获取摘要（多段摘要按顺序拼接）
+    abstract = fields["abstract"] if fields["abstract"] is not None else "No abstract available"
+
+    # 获取关键词（优先使用已有关键词；没有时留空，由 fill_keywords 在检索之后按批从摘要生成）
+    keywords = ", ".join(fields["keywords"]) if fields["keywords"] else None
+
+    # 紧凑记录（__slots__），期刊、年份、单位、国家做字符串驻留；列顺序见 ArticleRecord.COLUMNS
+    article_info = ArticleRecord(
+        index,
+        fields["pmid"],
+        title,
+        pub_year,
+        journal,
+        first_author,
+        corresponding_name,
+        affiliation,
+        cleaned_affiliation,
+        country,
+        abstract,
+        keywords
+    )
+    article_info.authors = entries
+    return article_info
+
+
+def try_build_article(fields, index):
+    """生成一条文献信息，失败时打印错误、按异常类型计数并返回 None。"""
+    try:
+        article_info = build_article(fields, index)
+    except Exception as e:
+        print(f"Error parsing article {index}: {e}")
+        METRICS.inc("parse_failures_total", exception=type(e).__name__)
+        return None
+    METRICS.inc("records_parsed_total")
+    return article_info
+
+
+def parse_articles(content, start_index=1):
+    """流式解析一页 efetch 返回的 XML 文档，逐条产出文献信息，Index 从 start_index 开始连续编号。"""
+    index = start_index
+    # XML 流式解析和字段提取的耗时计入 parse 阶段
+    for article in METRICS.timed_iter("parse", iter_article_elements(content)):
+        with METRICS.stage("parse"):
+            fields = extract_fields(article)
+        article_info = try_build_article(fields, index)
+        if article_info is not None:
+            index += 1
+            yield article_info
+
+
+def iter_pubmed(keyword, use_history=False, client=None, checkpoint=None, date_range=None, store=None):
     """
-    从通讯单位中提取国家信息，优化处理多种复杂情况，去除电子邮件和杂乱信息。
+    逐条产出关键词对应的全部文献（生成器），内存占用与结果总数无关，Index 从 1 开始连续编号。
+    :param use_history: 为 True 时使用 NCBI History Server，esearch 只调用一次，并按已知总数大批次 efetch
+    :param client: EutilsClient 实例（可带响应缓存或离线模式），默认不缓存
+    :param checkpoint: HarvestCheckpoint 实例，每页解析完成后保存，中断后重新运行时跳过已完成的页
+                       （断点和响应缓存按固定的页大小记录：带缓存时只自动调整每个请求合并的页数，
+                       只用断点不用缓存时页大小固定；都不使用时页大小按响应耗时和大小自动调整）
+    :param date_range: (mindate, maxdate)，只检索该收录日期（edat）范围内新增的文献
+    :param store: ArticleStore 实例；提供时只下载本地文献库中没有的文献，结果从文献库组装（不再需要分页断点）
     """
-    if not affiliation:
-        return "Unknown Country"
-
-    # 先移除电子邮件地址
-    email_match = re.search(r"\b\w+@\w+\.\w+\b", affiliation)
-    email_address = None
-    if email_match:
-        email_address = email_match.group(0)  # 提取电子邮件地址
-        affiliation = affiliation.replace(email_address, "")  # 移除电子邮件
-
-    # 移除句号和分号（如地址中存在）
-    affiliation = re.sub(r"[.;]", "", affiliation)
-
-    # 去掉额外的空格
-    affiliation = affiliation.strip()
-
-    # 特殊国家映射表（针对特定写法）
-    common_variants = {
-        "Republic of Korea": "South Korea",
-        "Korea": "South Korea",
-        "South Korea": "South Korea",
-        "P. R. China": "China",
-        "P R China": "China",
-        "CHN": "China",
-        "Taiwan": "Chinese Taiwan",
-        "China": "China",
-        "PRC": "China",
-        "People's Republic of China": "China",
-        "USA": "United States",
-        "United States of America": "United States",
-        "UK": "United Kingdom",
-        "England": "United Kingdom",
-        "Saudi Arabia": "Saudi Arabia",
-        "Spain": "Spain",
-        "Australia": "Australia",
-        "Japan": "Japan",
-        "JPN": "Japan",
-        "France": "France",
-        "Germany": "Germany",
-        "Poland": "Poland",
-        "Bangladesh": "Bangladesh",
-        "India": "India",
-        "Italy": "Italy",
-        "Thailand": "Thailand",
-        "Denmark": "Denmark",
-        "Belgium": "Belgium",
-        "Sweden": "Sweden",
-        "Iran": "Iran",
-        "Canada": "Canada",
-        "Egypt": "Egypt",
-        "the Netherlands": "the Netherlands",
-        "Brazil": "Brazil"
-
-
-    }
-
-    # 检查是否包含映射表中的关键词
-    for variant, country in common_variants.items():
-        if variant in affiliation:
-            return country
-
-    # 提取最后一个逗号之后的部分，直到最后一个句号为止
-    # 这部分很可能是国家信息
-    parts = affiliation.split(",")
-    if len(parts) > 1:
-        last_part = parts[-1].strip()
-
-        # 如果最后一部分是已知的国家，则返回该部分
-        if last_part in common_variants.values():
-            return last_part
-
-        # 否则返回最后一个词（即最后一个逗号到最后一个句号之间的词）
-        return last_part
-
-    # 如果没有匹配，返回Unknown
-    return "Unknown Country"
-
-def extract_keywords(abstract, top_n=5):
+    index = 0
+    term = f"{keyword} NOT Review[PT]"  # 排除综述文章
+    if store is not None:
+        for fields in search_fields(term, store, client=client, date_range=date_range):
+            article_info = try_build_article(fields, index + 1)
+            if article_info is not None:
+                index += 1
+                yield article_info
+        return
+
+    retmax = 500 if use_history else 200  # 每次请求返回的文献数
+    done_pages = checkpoint.completed_pages(keyword, retmax, date_range) if checkpoint else {}
+    cached = client is not None and client.cache is not None
+    batch = AdaptiveBatchSize(initial=retmax) if checkpoint is None or cached else None
+
+    # 多个 efetch 批次并发下载，按顺序逐页解析
+    for retstart, content in iter_pages(term, retmax=retmax, client=client, use_history=use_history,
+                                        date_range=date_range, skip=done_pages.keys(), batch=batch):
+        if content is None:
+            # 断点中已完成的页
+            print(f"Resuming articles from {retstart} to {retstart + retmax}...")
+            page = [ArticleRecord.from_mapping(article_info) for article_info in done_pages.pop(retstart)]
+            for article_info in page:
+                article_info["Index"] = index = index + 1
+        else:
+            page = list(parse_articles(content, index + 1))
+            print(f"Fetched articles from {retstart} to {retstart + len(page)}...")
+            index += len(page)
+            if checkpoint:
+                checkpoint.save_page(keyword, retstart, retmax, page, date_range)
+        yield from page
+
+
+def search_pubmed_all(keyword, keyword_model=None, profile=False, profile_path=None, **kwargs):
     """
-    从摘要中提取关键词。如果摘要为空，返回 'No keywords available'。
-    :param abstract: 文献摘要文本
-    :param top_n: 提取的关键词数量
-    :return: 关键词列表
+    检索关键词对应的全部文献并生成缺失的关键词，返回列表（其余参数同 iter_pubmed）。
+    运行结束时输出一行 JSON 指标日志（见 metrics.Metrics.run）。
+    :param profile: 为 True 时用 cProfile 分析这次检索，打印耗时最多的函数；profile_path 指定时保存 .prof 文件
     """
-    if not abstract:
-        return "No keywords available"
-
-    # 去掉标点和特殊字符，按空格拆分单词
-    words = re.findall(r'\b[a-zA-Z]{4,}\b', abstract.lower())  # 只提取长度 >= 4 的单词
-    common_words = set(["the", "with", "from", "that", "this", "these", "those","which", "while", "where", "there",
-                        "about", "have","machine learning","deep learning","AI","high","data","Machine learning","artificial intelligence",
-                        "research","Machine learning"])
-    filtered_words = [word for word in words if word not in common_words]
-
-    # 使用 Counter 统计词频，返回最常见的 top_n 个词
-    most_common = Counter(filtered_words).most_common(top_n)
-    return ", ".join([word for word, _ in most_common])
-
-
-def search_pubmed_all(keyword):
-    all_articles = []
-    retstart = 0
-    retmax = 200  # 每次请求返回 200 篇文献
-
-    while True:
-        # 使用 esearch API 搜索关键词
-        search_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-        search_params = {
-            "db": "pubmed",
-            "term": f"{keyword} NOT Review[PT]",  # 排除综述文章
-            "retmax": retmax,
-            "retstart": retstart,
-            "retmode": "xml"
-        }
-        search_response = requests.get(search_url, params=search_params)
-        search_soup = BeautifulSoup(search_response.content, "xml")
-        pmids = [id_tag.text for id_tag in search_soup.find_all("Id")]
-
-        # 如果没有新的文献 ID，停止请求
-        if not pmids:
-            break
-
-        print(f"Fetching articles from {retstart} to {retstart + retmax}...")
-
-        # 使用 efetch API 获取详细的文献信息
-        fetch_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
-        fetch_params = {
-            "db": "pubmed",
-            "id": ",".join(pmids),
-            "retmode": "xml"
-        }
-        fetch_response = requests.get(fetch_url, params=fetch_params)
-        fetch_soup = BeautifulSoup(fetch_response.content, "xml")
-
-        # 解析返回的 XML 文档
-        for i, article in enumerate(fetch_soup.find_all("PubmedArticle")):
-            try:
-                title = article.find("ArticleTitle").text if article.find("ArticleTitle") else "No title available"
-                journal = article.find("Title").text if article.find("Title") else "No journal available"
-
-                # 提取年度信息
-                pub_date = article.find("PubDate")
-                pub_year = "Unknown"
-                if pub_date:
-                    year = pub_date.find("Year")
-                    if year:
-                        pub_year = year.text
-
-                # 获取作者信息
-                authors = article.find_all("Author")
-                first_author = f"{authors[0].find('LastName').text} {authors[0].find('ForeName').text}" if authors else "Unknown"
-                corresponding_author = "Unknown"
-                affiliations = []
-
-                # 遍历作者，查找通讯作者信息
-                for author in authors:
-                    affiliation = author.find("AffiliationInfo")
-                    if affiliation:
-                        affiliations.append(affiliation.find("Affiliation").text)
-                    if author.get("ValidYN") == "Y":
-                        corresponding_author = f"{author.find('LastName').text} {author.find('ForeName').text}"
-
-                # 获取通讯单位（取第一个通讯作者的单位）
-                affiliation = affiliations[0] if affiliations else "No affiliation available"
-                cleaned_affiliation = clean_affiliation(affiliation)
-                country = extract_country(affiliation)
-
-                # 获取摘要
-                abstract = article.find("AbstractText").text if article.find(
-                    "AbstractText") else "No abstract available"
-
-                # 获取关键词（优先使用已有关键词，否则从摘要生成）
-                keyword_list = article.find_all("Keyword")
-                if keyword_list:
-                    keywords = ", ".join([kw.text for kw in keyword_list])
-                else:
-                    keywords = extract_keywords(abstract)
-
-                article_info = {
-                    "Index": len(all_articles) + 1,
-                    "Title": title,
-                    "Publication Year": pub_year,
-                    "Journal": journal,
-                    "First Author": first_author,
-                    "Corresponding Author": corresponding_author,
-                    "Affiliation": affiliation,
-                    "University": cleaned_affiliation,
-                    "Country": country,
-                    "Abstract": abstract,
-                    "Keywords": keywords
-                }
-                all_articles.append(article_info)
-            except Exception as e:
-                print(f"Error parsing article {len(all_articles) + 1}: {e}")
-
-        # 更新起始位置，准备请求下一页
-        retstart += retmax
-
-    return all_articles
-
-
-def export_to_csv(articles,filename):
-    # 将结果导出为 CSV
-    df = pd.DataFrame(articles)
-    filepath = r"C:\Users\ZMS\Desktop\pubmed/" + filename
-    df.to_csv(filepath, index=False, encoding="utf-8-sig")
-    print(f"Results exported to {filepath}")
+    if keyword_model is None:
+        keyword_model = KeywordModel()
+    with METRICS.run("search_pubmed_all", keyword=keyword):
+        if profile or profile_path:
+            with profiled(profile_path):
+                return list(fill_keywords(iter_pubmed(keyword, **kwargs), keyword_model))
+        return list(fill_keywords(iter_pubmed(keyword, **kwargs), keyword_model))
 
-# 示例使用
 
+def export_to_csv(articles, filename, append=False, chunk_size=1000, index=None):
+    """
+    将结果分块导出为 CSV，articles 可以是任意可迭代对象，每 chunk_size 条写入一次。
+    articles 应已经过关键词阶段（search_pubmed_all 的结果，或 fill_keywords(iter_pubmed(...), keyword_model)），
+    这里不再生成关键词：同一篇文献再次经过 fill_keywords 会在 IDF 中重复计数。
+    append=True 时追加到已有文件末尾（增量更新），Index 接着已有行号继续编号，已有的文献不会重复写入。
+    index 为 TextIndex 实例时，写入的文献同时加入全文索引（数据集名称为不含扩展名的文件名）。
+    """
+    filepath = os.path.join(OUTPUT_DIR, filename)
+    with METRICS.run("export_to_csv", filepath=filepath), \
+            CsvChunkWriter(filepath, chunk_size=chunk_size, append=append, index=index,
+                           dataset=os.path.splitext(filename)[0]) as writer:
+        written = sum(writer.write(article) for article in articles)
+    print(f"{written} articles exported to {filepath}")
+
+
+@METRICS.timed_run("harvest_topic")
+def harvest_topic(topic, start_year, end_year, name, client=None, store=None, checkpoint=None,
+                  incremental=False, output_dir=OUTPUT_DIR, output_format="csv", keyword_model=None, index=None,
+                  dedup=None, graph=None):
+    """
+    按年份检索一个主题并逐年导出，文献边检索边写入文件。
+    :param topic: 检索主题（不含年份条件）
+    :param name: 输出数据集名称，例如 "Bio-imaging"（CSV 文件名为 Bio-imaging-2020-pubmed_research.csv）
+    :param output_dir: 输出目录
+    :param output_format: "csv"（每年一个文件）或 "parquet"（按年份分区的列式数据集 <name>/year=XXXX/）
+    :param checkpoint: HarvestCheckpoint 实例，已导出的年份会被跳过
+    :param incremental: 为 True 时只检索上次运行之后新收录的文献并追加到已有文件
+    :param keyword_model: KeywordModel 实例，没有关键词的文献按批用 TF-IDF 生成关键词，词表和 IDF 随检索增量更新
+    :param index: TextIndex 实例，导出的文献同时加入全文索引（数据集名称为 name），之后可在本地查询
+    :param dedup: NearDuplicateIndex 实例，与同一数据集（name）中已记录文献近似重复的文献（勘误、再版等）不导出
+    :param graph: AuthorGraph 实例，导出文献的全部作者同时加入作者表和合作网络
+    """
+    if keyword_model is None:
+        keyword_model = KeywordModel()
+    date_range = checkpoint.next_date_range(topic) if incremental and checkpoint else None
+    run_date = datetime.date.today().strftime("%Y/%m/%d")
+
+    def is_done(year):
+        return checkpoint is not None and checkpoint.is_done(f"{topic}|{year}", date_range)
+
+    # 先查询文献数量并规划检索分区：跳过没有文献的年份，合并稀疏的年代，拆分超过检索上限的年份
+    partitions = plan_partitions(client, topic, start_year, end_year, date_range=date_range)
+    print(f"Planned {len(partitions)} queries for {sum(p.count for p in partitions)} articles.")
+
+    writers = {}  # 正在写入的年份 -> CsvChunkWriter
+    keywords = []  # 这些年份对应的分区检索式
+    years = set()  # 这些分区覆盖的全部年份（包括没有写入文献的年份）
+    for i, partition in enumerate(partitions):
+        if all(is_done(year) for year in range(partition.start.year, partition.end.year + 1)):
+            print(f"Skipping {partition.start} - {partition.end} (already done).")
+            continue
+
+        # 调用 PubMed 搜索函数，逐条取得该分区的文章，按年份写入对应的文件
+        keyword = partition_term(topic, partition.start, partition.end)
+        articles = iter_pubmed(keyword, client=client, checkpoint=checkpoint, date_range=date_range, store=store)
+        if dedup is not None:
+            articles = drop_near_duplicates(articles, dedup, name)
+        if graph is not None:
+            articles = add_to_graph(articles, graph)
+        for article in fill_keywords(articles, keyword_model):
+            year = partition_year(partition, article["Publication Year"])
+            if is_done(year):
+                continue
+            if year not in writers:
+                writers[year] = open_writer(output_dir, name, year, output_format, append=date_range is not None,
+                                            index=index)
+            # 相邻分区（按电子/印刷出版日期）可能检索到同一篇文献，写入器按 PMID 去重
+            writers[year].write(article)
+        keywords.append(keyword)
+        years.update(range(partition.start.year, partition.end.year + 1))
+
+        # 下一个分区进入新的年份时，之前的年份已经完整，关闭文件并标记完成
+        # （合并的稀疏分区中没有文献的年份也标记完成，否则重新运行时整个分区会再次检索）
+        if i + 1 < len(partitions) and partitions[i + 1].start.year <= partition.end.year:
+            continue
+        for year in sorted(writers):
+            writers[year].close()
+            print(f"Exported {writers[year].count} articles for year {year} to {writers[year].filepath}")
+        if checkpoint is not None:
+            for year in sorted(years | set(writers)):
+                checkpoint.mark_done(f"{topic}|{year}", date_range)
+            for keyword in keywords:
+                checkpoint.clear_pages(keyword, date_range)
+        writers, keywords, years = {}, [], set()
+
+    # 记录本次更新到的日期，下次增量运行从这里开始
+    if checkpoint is not None:
+        checkpoint.set_last_update(topic, run_date)
 
-for year in range(1960, 2025):  # 设置循环的年度范围
-    keyword = "(Machine Learning OR Artificial Intelligence) AND (bio-imaging OR Medical Imaging) AND {}[DP]".format(year)
-
-    # 调用 PubMed 搜索函数，获取相应年份的所有文章
-    articles = search_pubmed_all(keyword)
 
-    # 如果找到了文献，导出为 CSV 文件
-    if articles:
-        filename = "Bio-imaging-{}-pubmed_research.csv".format(year)
-        export_to_csv(articles, filename=filename)
-        print(f"Exported articles for year {year}.")
-    else:
-        print(f"No articles found for year {year}.")
\ No newline at end of file
+# 示例使用
+if __name__ == "__main__":
+    # 响应缓存：重复运行时直接复用已下载的响应；OFFLINE = True 时只从缓存读取，不访问网络
+    CACHE_PATH = "pubmed_cache.sqlite"
+    OFFLINE = False
+    client = EutilsClient(cache=ResponseCache(CACHE_PATH), offline=OFFLINE)
+
+    # 本地文献库：与其他检索（如 bio-imaging.py）重叠的文献不再重复下载
+    STORE_PATH = "pubmed_articles.sqlite"
+    store = ArticleStore(STORE_PATH)
+
+    # 断点续传：已导出的年份会被跳过；INCREMENTAL = True 时只检索上次运行之后新收录的文献并追加到已有文件
+    CHECKPOINT_DIR = "pubmed_checkpoint"
+    INCREMENTAL = False
+    checkpoint = HarvestCheckpoint(CHECKPOINT_DIR)
+
+    # 关键词模型：增量运行时接着上次保存的词表和 IDF 更新，新文献的关键词按全部已检索文献计算
+    KEYWORD_MODEL_PATH = "keyword_model.npz"
+    keyword_model = KeywordModel.load(KEYWORD_MODEL_PATH) if INCREMENTAL else KeywordModel()
+
+    # 全文索引：导出时逐块建立，之后可用 text_index.py 在已检索的文献中查询，不必重新检索
+    INDEX_PATH = "pubmed_index.sqlite"
+    text_index = TextIndex(INDEX_PATH)
+
+    # 近似重复检测：签名持久保存，新文献只与已有的 LSH 分桶比较，勘误和再版的文献不导出
+    DEDUP_PATH = "pubmed_dedup.sqlite"
+    dedup = NearDuplicateIndex(DEDUP_PATH)
+
+    # 全部作者的单位/国家表和合作网络（合著、单位合作、国家合作的稀疏矩阵），随检索增量更新
+    GRAPH_DIR = "author_graph"
+    graph = AuthorGraph(GRAPH_DIR)
+
+    topic = "(Machine Learning OR Artificial Intelligence) AND (bio-imaging OR Medical Imaging)"
+    # 输出格式："csv" 或 "parquet"（列式存储，分析时只读取需要的列）；输出目录可通过环境变量 PUBMED_OUTPUT_DIR 设置
+    OUTPUT_FORMAT = "csv"
+    harvest_topic(topic, 1960, 2024, "Bio-imaging",  # 设置年度范围
+                  client=client, store=store, checkpoint=checkpoint, incremental=INCREMENTAL,
+                  output_format=OUTPUT_FORMAT, keyword_model=keyword_model, index=text_index, dedup=dedup,
+                  graph=graph)
+    keyword_model.save(KEYWORD_MODEL_PATH)
+    graph.save()
+    print("Top country pairs:")
+    print(graph.country_pairs(10).to_string(index=False))
@@ -0,0 +1,134 @@
+import io
+import re
+
+from lxml import etree
+
+# MEDLINE 中通讯作者的单位通常带有电子邮件地址（"Electronic address: ..."）
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+|Electronic address", re.IGNORECASE)
+
+
+def element_text(element):
+    """返回元素及其所有子元素中的文本（与 BeautifulSoup 的 .text 一致），元素为 None 时返回 None。"""
+    if element is None:
+        return None
+    return "".join(element.itertext())
+
+
+def iter_article_elements(content):
+    """
+    以流式方式逐个产出 efetch XML 中的 PubmedArticle 元素。
+    调用方处理完一个元素后，该元素及之前的兄弟节点会被释放，内存占用与单篇文献大小相当。
+    """
+    context = etree.iterparse(io.BytesIO(content), events=("end",), tag="PubmedArticle",
+                              recover=True, resolve_entities=False, no_network=True)
+    for _, article in context:
+        yield article
+        # 释放已处理的元素
+        article.clear()
+        while article.getprevious() is not None:
+            del article.getparent()[0]
+    del context
+
+
+def split_article_set(content, sizes=None, pmid_groups=None):
+    """
+    把一个 efetch 返回的文档拆成多个 PubmedArticleSet 文档（bytes 列表），文献保持原来的顺序：
+    提供 sizes 时依次按篇数拆分（History Server 分页），提供 pmid_groups 时每组包含 PMID 在该组中的文献。
+    """
+    if pmid_groups is not None:
+        group_of = {pmid: i for i, group in enumerate(pmid_groups) for pmid in group}
+        parts = [[] for _ in pmid_groups]
+    else:
+        bounds = [sum(sizes[:i + 1]) for i in range(len(sizes))]
+        parts = [[] for _ in sizes]
+    for position, article in enumerate(iter_article_elements(content)):
+        if pmid_groups is not None:
+            i = group_of.get(article.findtext("MedlineCitation/PMID"))
+        else:
+            i = next((i for i, bound in enumerate(bounds) if position < bound), None)
+        if i is not None:
+            parts[i].append(etree.tostring(article, encoding="UTF-8", xml_declaration=False, with_tail=False))
+    return [b'<?xml version="1.0" ?>\n<PubmedArticleSet>' + b"".join(part) + b"</PubmedArticleSet>\n"
+            for part in parts]
+
+
+def extract_fields(article):
+    """
+    单次遍历 PubmedArticle，提取解析所需的全部原始字段（只包含字符串、列表和字典，可直接序列化为 JSON）。
+    各字段取文档中第一次出现的元素（与原先的 find 行为一致）；Article/Abstract 中的多段 AbstractText 按顺序拼接，
+    OtherAbstract 中的译文摘要不计入。
+    """
+    fields = {
+        "pmid": None,
+        "title": None,
+        "journal": None,
+        "pub_date": None,
+        "pub_year": None,
+        "authors": [],
+        "abstract": None,
+        "keywords": []
+    }
+    abstract_parts = []
+
+    for element in article.iter():
+        tag = element.tag
+        if tag == "PMID":
+            if fields["pmid"] is None:
+                fields["pmid"] = element.text
+        elif tag == "ArticleTitle":
+            if fields["title"] is None:
+                fields["title"] = element_text(element)
+        elif tag == "Title":
+            if fields["journal"] is None:
+                fields["journal"] = element_text(element)
+        elif tag == "PubDate":
+            if fields["pub_date"] is None:
+                fields["pub_date"] = element_text(element)
+                fields["pub_year"] = element_text(element.find("Year"))
+        elif tag == "Author":
+            fields["authors"].append(_author_fields(element))
+        elif tag == "AbstractText" and element.getparent().tag == "Abstract":
+            abstract_parts.append(element_text(element).strip())
+        elif tag == "Keyword":
+            fields["keywords"].append(element_text(element))
+
+    if abstract_parts:
+        fields["abstract"] = " ".join(part for part in abstract_parts if part)
+    return fields
+
+
+def _author_fields(author):
+    affiliations = [element_text(element) for element in author.iterfind("AffiliationInfo/Affiliation")]
+    return {
+        "last_name": element_text(author.find("LastName")),
+        "fore_name": element_text(author.find("ForeName")),
+        "affiliation": affiliations[0] if affiliations else None,
+        "affiliations": affiliations,
+        "valid_yn": author.get("ValidYN")
+    }
+
+
+def author_name(author):
+    """返回 "LastName ForeName" 形式的作者姓名；缺少姓或名（如团体作者）时抛出 ValueError。"""
+    if author["last_name"] is None or author["fore_name"] is None:
+        raise ValueError("author has no LastName/ForeName")
+    return f"{author['last_name']} {author['fore_name']}"
+
+
+def author_affiliation(author):
+    """返回作者的第一个单位，没有则返回 None。"""
+    return author["affiliation"]
+
+
+def corresponding_author(authors):
+    """
+    推断通讯作者：ValidYN 只表示姓名是否有效（几乎所有作者都是 "Y"），不能用来判断通讯作者。
+    取第一个单位中带有电子邮件地址的作者，没有时按惯例取最后一位作者；ValidYN="N" 的作者不参与。
+    没有作者时返回 None。
+    """
+    valid = [author for author in authors if author["valid_yn"] != "N"]
+    for author in valid:
+        if any(EMAIL_PATTERN.search(affiliation) for affiliation in author.get("affiliations") or []
+               if affiliation):
+            return author
+    return valid[-1] if valid else None
@@ -0,0 +1,65 @@
+import sys
+from collections.abc import MutableMapping
+
+
+def intern_value(value):
+    """字符串驻留：重复出现的值（期刊、国家、单位、年份等）在内存中只保留一份。"""
+    return sys.intern(value) if type(value) is str else value
+
+
+class ArticleRecord(MutableMapping):
+    """
+    一条文献信息的紧凑表示：字段保存在 __slots__ 中（没有每条记录一个的 dict），
+    同时按列名像 dict 一样读写（record["Title"]、record.get("PMID")、dict(record)），
+    写入器、检查点和 pd.DataFrame 可以直接使用。
+    INTERNED_COLUMNS 中的低基数字段在创建和赋值时做字符串驻留。
+    authors 不是导出的列：全部作者的条目 [(姓名, 单位, 国家, 是否通讯作者)]（见 authors.author_entries），没有时为 None。
+    """
+
+    __slots__ = ("index", "pmid", "title", "publication_year", "journal", "first_author", "corresponding_author",
+                 "affiliation", "university", "country", "abstract", "keywords", "authors")
+
+    COLUMNS = ("Index", "PMID", "Title", "Publication Year", "Journal", "First Author", "Corresponding Author",
+               "Affiliation", "University", "Country", "Abstract", "Keywords")
+    INTERNED_COLUMNS = frozenset(["Publication Year", "Journal", "University", "Country"])
+    _SLOT_BY_COLUMN = dict(zip(COLUMNS, __slots__))
+
+    def __init__(self, *values):
+        if len(values) != len(self.COLUMNS):
+            raise TypeError(f"ArticleRecord takes {len(self.COLUMNS)} values, got {len(values)}")
+        for column, value in zip(self.COLUMNS, values):
+            self[column] = value
+        self.authors = None
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """由 dict（例如检查点中保存的记录，作者条目在 "Authors" 中）创建，缺少的列为 None。"""
+        record = cls(*(mapping.get(column) for column in cls.COLUMNS))
+        if mapping.get("Authors"):
+            record.authors = [tuple(intern_value(value) for value in entry) for entry in mapping["Authors"]]
+        return record
+
+    def __getitem__(self, column):
+        try:
+            return getattr(self, self._SLOT_BY_COLUMN[column])
+        except KeyError:
+            raise KeyError(column) from None
+
+    def __setitem__(self, column, value):
+        try:
+            slot = self._SLOT_BY_COLUMN[column]
+        except KeyError:
+            raise KeyError(column) from None
+        setattr(self, slot, intern_value(value) if column in self.INTERNED_COLUMNS else value)
+
+    def __delitem__(self, column):
+        raise TypeError("ArticleRecord columns cannot be deleted")
+
+    def __iter__(self):
+        return iter(self.COLUMNS)
+
+    def __len__(self):
+        return len(self.COLUMNS)
+
+    def __repr__(self):
+        return f"ArticleRecord({dict(self)!r})"
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_TTL = 30 * 24 * 3600  # 默认缓存 30 天
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 默认最多占用 2 GB（压缩后）
+
+# NCBI History Server 上的 WebEnv 大约 8 小时后失效，相关响应的有效期不能超过这个时间
+HISTORY_TTL = 8 * 3600
+
+# 不参与缓存键计算的参数
+IGNORED_PARAMS = {"api_key", "tool", "email"}
+
+
+def cache_key(url, params):
+    """根据接口地址和规范化后的参数生成缓存键。"""
+    normalized = sorted((str(k), str(v)) for k, v in params.items() if k not in IGNORED_PARAMS)
+    raw = url + "?" + json.dumps(normalized, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def uses_history(params):
+    return params.get("usehistory") == "y" or "WebEnv" in params
+
+
+class ResponseCache:
+    """
+    基于 SQLite 的 esearch/efetch 响应缓存。
+    响应内容经 zlib 压缩后按 (接口, 参数) 存储；超过 ttl 的条目视为过期，
+    总大小超过 max_bytes 时按最近访问时间淘汰最旧的条目。
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 多个进程（如 batch_harvest.py 的工作进程）共用同一个库时，最多等待 60 秒写锁
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                params TEXT NOT NULL,
+                content BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    def get(self, url, params, ignore_ttl=False):
+        """返回缓存的响应内容；未命中或已过期时返回 None。ignore_ttl=True 时忽略过期时间（离线模式）。"""
+        key = cache_key(url, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            content, created = row
+            ttl = min(self.ttl, HISTORY_TTL) if uses_history(params) else self.ttl
+            if not ignore_ttl and now - created > ttl:
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return zlib.decompress(content)
+
+    def put(self, url, params, content):
+        """写入一条响应，并在超出容量时淘汰最久未访问的条目。"""
+        key = cache_key(url, params)
+        compressed = zlib.compress(content)
+        now = time.time()
+        stored_params = json.dumps({k: str(v) for k, v in params.items() if k not in IGNORED_PARAMS},
+                                   ensure_ascii=False, sort_keys=True)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, url, params, content, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, stored_params, compressed, len(compressed), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def purge_expired(self):
+        """删除所有已过期的条目。"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+
+from trends import DIMENSIONS, TrendIndex, TrendMatrices, emerging_scores, growth_rates, merge_trends, save_trend_tables
+
+
+def test_empty_trends(tmp_path):
+    """没有任何文献时（例如输出目录中没有数据、查询没有匹配）趋势表为空，不抛出异常。"""
+    empty = TrendMatrices.from_frame(pd.DataFrame(columns=["Publication Year", "Keywords", "Country", "Journal"]))
+    for trends in (empty, merge_trends([])):
+        assert len(trends.years) == 0
+        for dimension in DIMENSIONS:
+            assert growth_rates(trends, dimension).empty
+            assert emerging_scores(trends, dimension).empty
+        save_trend_tables(trends, str(tmp_path))
+        for dimension in DIMENSIONS:
+            assert pd.read_csv(os.path.join(tmp_path, "frequency_tables", f"trends_{dimension}.csv")).empty
+
+
+def test_counts_by_year():
+    df = pd.DataFrame({"Publication Year": ["2020", "2020", "2021", "Unknown"],
+                       "Keywords": ["MRI, CT", "MRI", "CT, deep learning", "MRI"],
+                       "Country": ["China", "Unknown Country", "Japan", "China"],
+                       "Journal": ["J A", "J B", "J A", "J A"]})
+    trends = TrendMatrices.from_frame(df)
+    assert list(trends.years) == [2020, 2021]
+    assert list(trends.totals) == [2, 1]
+    assert trends.series("keyword", ["CT", "MRI"]).to_dict("list") == {"CT": [1, 1], "MRI": [2, 0]}
+    assert list(trends.labels["country"]) == ["China", "Japan"]
+    assert list(trends.labels["keyword"]) == ["CT", "MRI"]  # 无用词不计入
+
+
+def test_index_without_tables(tmp_path):
+    """目录中没有数据表时返回空矩阵，即使之前缓存过矩阵（例如查询结果目录）。"""
+    df = pd.DataFrame({"Publication Year": ["2020"], "Keywords": ["MRI"], "Country": ["China"], "Journal": ["J A"]})
+    index = TrendIndex(str(tmp_path))
+    TrendMatrices.from_frame(df).save(index.trends_path)
+    trends, _ = index.update([], pd.read_csv)
+    assert len(trends.years) == 0
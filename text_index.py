@@ -0,0 +1,402 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from dataset import find_tables, open_writer, read_table
+from metrics import METRICS
+from records import ArticleRecord
+
+# 建立索引的字段：查询中的字段名 -> 记录的列
+INDEX_FIELDS = {"title": "Title", "abstract": "Abstract", "keywords": "Keywords"}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# 查询语法：括号、运算符和词（可带 字段: 前缀和末尾的 * 前缀通配符，或用引号括起）
+QUERY_PATTERN = re.compile(r'\(|\)|(?:(\w+):)?("[^"]*"|[^\s()"]+)')
+OPERATORS = {"AND", "OR", "NOT"}
+
+SQLITE_VARIABLES = 500  # 每条 SQL 语句最多的参数个数
+
+
+def tokenize(text):
+    """索引和查询共用的分词规则：转小写，按字母和数字切分。"""
+    return TOKEN_PATTERN.findall(str(text).lower()) if text is not None and text == text else []
+
+
+def encode_postings(doc_ids):
+    """把升序的文献编号编码为差值序列（uint32）后 zlib 压缩。"""
+    return zlib.compress(np.diff(np.asarray(doc_ids, dtype=np.int64), prepend=0).astype(np.uint32).tobytes())
+
+
+def decode_postings(blob):
+    return np.cumsum(np.frombuffer(zlib.decompress(blob), dtype=np.uint32), dtype=np.int64)
+
+
+def parse_year(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class QuerySyntaxError(ValueError):
+    """无法解析的查询。"""
+
+
+def parse_query(query):
+    """
+    把查询解析为表达式树：("term", 字段或 None, 词)、("prefix", 字段或 None, 前缀)、("and"/"or", 左, 右)、("not", 子式)。
+    优先级 NOT > AND > OR，相邻的词之间默认为 AND，例如
+    'transformer AND (segmentation OR title:detection) NOT review'、'transform* keywords:"deep learning"'。
+    """
+    tokens = []
+    position = 0
+    for match in QUERY_PATTERN.finditer(query):
+        if query[position:match.start()].strip():
+            raise QuerySyntaxError(f"Unexpected {query[position:match.start()].strip()!r} in query")
+        position = match.end()
+        text = match.group(0)
+        if text in ("(", ")") or (match.group(1) is None and text in OPERATORS):
+            tokens.append(text)
+        else:
+            field = match.group(1).lower() if match.group(1) else None
+            if field is not None and field not in INDEX_FIELDS:
+                raise QuerySyntaxError(f"Unknown field {field!r}, expected one of {', '.join(INDEX_FIELDS)}")
+            tokens.append((field, match.group(2).strip('"')))
+    if query[position:].strip():
+        raise QuerySyntaxError(f"Unexpected {query[position:].strip()!r} in query")
+
+    def peek():
+        return tokens[0] if tokens else None
+
+    def parse_or():
+        node = parse_and()
+        while peek() == "OR":
+            tokens.pop(0)
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while peek() is not None and peek() not in ("OR", ")"):
+            if peek() == "AND":
+                tokens.pop(0)
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not():
+        if peek() == "NOT":
+            tokens.pop(0)
+            return ("not", parse_not())
+        return parse_atom()
+
+    def parse_atom():
+        token = tokens.pop(0) if tokens else None
+        if token == "(":
+            node = parse_or()
+            if peek() != ")":
+                raise QuerySyntaxError("Missing ')' in query")
+            tokens.pop(0)
+            return node
+        if not isinstance(token, tuple):
+            raise QuerySyntaxError(f"Expected a term, got {token!r}")
+        field, word = token
+        if word.endswith("*") and len(word) > 1:
+            return ("prefix", field, word[:-1].lower())
+        words = tokenize(word)
+        if not words:
+            raise QuerySyntaxError(f"Term {word!r} has no searchable characters")
+        # 含有多个词（如 deep-learning、"deep learning"）时要求全部出现
+        node = ("term", field, words[0])
+        for word in words[1:]:
+            node = ("and", node, ("term", field, word))
+        return node
+
+    if not tokens:
+        raise QuerySyntaxError("Empty query")
+    tree = parse_or()
+    if tokens:
+        raise QuerySyntaxError(f"Unexpected {tokens[0]!r} in query")
+    return tree
+
+
+class TextIndex:
+    """
+    已导出文献的本地全文索引（SQLite）：docs 表按 (数据集, PMID) 保存每篇文献的压缩记录和出版年份，
+    postings 表保存每个词在每个字段（title/abstract/keywords）中出现的文献编号（差值编码后压缩）。
+    每次 add 写入一个新的倒排块，不改写已有的块，可以在导出时逐块增量建立；optimize() 把同一个词的块合并。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # 多个进程（如 batch_harvest.py 的工作进程）共用同一个索引时，最多等待 60 秒写锁
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id INTEGER PRIMARY KEY,
+                key TEXT UNIQUE NOT NULL,
+                dataset TEXT NOT NULL,
+                year INTEGER,
+                record BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS docs_dataset_year ON docs (dataset, year);
+            CREATE INDEX IF NOT EXISTS docs_year ON docs (year);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                field TEXT NOT NULL,
+                block INTEGER NOT NULL,
+                doc_ids BLOB NOT NULL,
+                PRIMARY KEY (term, field, block)
+            ) WITHOUT ROWID;
+        """)
+
+    def add(self, records, dataset):
+        """
+        把一批记录加入数据集 dataset 的索引，返回新加入的篇数。
+        同一数据集中 PMID（没有 PMID 时为标题）已经索引过的记录跳过。
+        """
+        rows = []
+        keys = set()
+        for record in records:
+            key = "{}|{}".format(dataset, record.get("PMID") or record.get("Title"))
+            if key not in keys:
+                keys.add(key)
+                rows.append((key, record))
+        if not rows:
+            return 0
+
+        with self._lock, METRICS.stage("index"):
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = set()
+                key_list = list(keys)
+                for start in range(0, len(key_list), SQLITE_VARIABLES):
+                    batch = key_list[start:start + SQLITE_VARIABLES]
+                    existing.update(key for key, in self._conn.execute(
+                        "SELECT key FROM docs WHERE key IN ({})".format(",".join("?" * len(batch))), batch))
+
+                postings = {}
+                block = None
+                for key, record in rows:
+                    if key in existing:
+                        continue
+                    record = {column: record.get(column) for column in ArticleRecord.COLUMNS if column != "Index"}
+                    doc_id = self._conn.execute(
+                        "INSERT INTO docs (key, dataset, year, record) VALUES (?, ?, ?, ?)",
+                        (key, dataset, parse_year(record["Publication Year"]),
+                         zlib.compress(json.dumps(record, ensure_ascii=False).encode("utf-8")))).lastrowid
+                    if block is None:
+                        block = doc_id
+                    for field, column in INDEX_FIELDS.items():
+                        for term in set(tokenize(record[column])):
+                            postings.setdefault((term, field), []).append(doc_id)
+
+                # 文献编号递增分配，每个列表已是升序
+                self._conn.executemany("INSERT INTO postings (term, field, block, doc_ids) VALUES (?, ?, ?, ?)",
+                                       ((term, field, block, encode_postings(doc_ids))
+                                        for (term, field), doc_ids in postings.items()))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        added = len(rows) - len(existing)
+        METRICS.inc("records_indexed_total", added)
+        return added
+
+    def optimize(self):
+        """把每个 (词, 字段) 的全部倒排块合并为一块，减少查询时读取的行数。"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                merged = {}
+                for term, field, blob in self._conn.execute(
+                        "SELECT term, field, doc_ids FROM postings ORDER BY term, field, block"):
+                    merged.setdefault((term, field), []).append(decode_postings(blob))
+                self._conn.execute("DELETE FROM postings")
+                self._conn.executemany("INSERT INTO postings (term, field, block, doc_ids) VALUES (?, ?, 0, ?)",
+                                       ((term, field, encode_postings(np.concatenate(parts)))
+                                        for (term, field), parts in merged.items()))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._conn.execute("VACUUM")
+
+    def _postings(self, sql, params, field):
+        if field is not None:
+            sql += " AND field = ?"
+            params = params + (field,)
+        with self._lock:
+            blobs = [blob for blob, in self._conn.execute(sql, params)]
+        if not blobs:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([decode_postings(blob) for blob in blobs]))
+
+    def _filtered(self, dataset=None, start_year=None, end_year=None):
+        """满足数据集和年份条件的全部文献编号（NOT 的全集）。"""
+        conditions, params = [], []
+        if dataset is not None:
+            conditions.append("dataset = ?")
+            params.append(dataset)
+        if start_year is not None:
+            conditions.append("year >= ?")
+            params.append(start_year)
+        if end_year is not None:
+            conditions.append("year <= ?")
+            params.append(end_year)
+        sql = "SELECT doc_id FROM docs" + (" WHERE " + " AND ".join(conditions) if conditions else "")
+        with self._lock:
+            return np.fromiter((doc_id for doc_id, in self._conn.execute(sql, params)), dtype=np.int64)
+
+    def _evaluate(self, node, universe):
+        kind = node[0]
+        if kind == "term":
+            return self._postings("SELECT doc_ids FROM postings WHERE term = ?", (node[2],), node[1])
+        if kind == "prefix":
+            # 前缀范围：prefix <= term < prefix + U+10FFFF
+            return self._postings("SELECT doc_ids FROM postings WHERE term >= ? AND term < ?",
+                                  (node[2], node[2] + "\U0010ffff"), node[1])
+        if kind == "not":
+            return np.setdiff1d(universe(), self._evaluate(node[1], universe), assume_unique=True)
+        left = self._evaluate(node[1], universe)
+        if kind == "and" and len(left) == 0:
+            return left
+        right = self._evaluate(node[2], universe)
+        if kind == "and":
+            return np.intersect1d(left, right, assume_unique=True)
+        return np.union1d(left, right)
+
+    def search(self, query, dataset=None, start_year=None, end_year=None):
+        """
+        执行布尔查询（语法见 parse_query），返回匹配文献的编号（升序 numpy 数组）。
+        :param dataset: 只在该数据集（导出时的名称，如 "Bio-imaging"）中查找
+        :param start_year, end_year: 出版年份范围（含两端）
+        """
+        tree = parse_query(query)
+        with METRICS.stage("query"):
+            filtered = None
+
+            def universe():
+                nonlocal filtered
+                if filtered is None:
+                    filtered = self._filtered(dataset, start_year, end_year)
+                return filtered
+
+            doc_ids = self._evaluate(tree, universe)
+            if dataset is not None or start_year is not None or end_year is not None:
+                doc_ids = np.intersect1d(doc_ids, universe(), assume_unique=True)
+        return doc_ids
+
+    def records(self, doc_ids, batch_size=SQLITE_VARIABLES):
+        """按编号顺序逐条产出文献记录（ArticleRecord，Index 从 1 开始连续编号）。"""
+        index = 0
+        for start in range(0, len(doc_ids), batch_size):
+            batch = [int(doc_id) for doc_id in doc_ids[start:start + batch_size]]
+            with self._lock:
+                rows = dict(self._conn.execute(
+                    "SELECT doc_id, record FROM docs WHERE doc_id IN ({})".format(",".join("?" * len(batch))), batch))
+            for doc_id in batch:
+                if doc_id in rows:
+                    index += 1
+                    record = json.loads(zlib.decompress(rows[doc_id]))
+                    record["Index"] = index
+                    yield ArticleRecord.from_mapping(record)
+
+    def to_dataframe(self, doc_ids, columns=None):
+        """把匹配的文献组装为 DataFrame（columns 指定时只保留这些列），可以直接交给 burble 统计和绘图。"""
+        df = pd.DataFrame([dict(record) for record in self.records(doc_ids)], columns=list(ArticleRecord.COLUMNS))
+        return df if columns is None else df[[column for column in columns if column in df]]
+
+    def datasets(self):
+        """已索引的数据集及其文献数：{数据集: 篇数}。"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT dataset, COUNT(*) FROM docs GROUP BY dataset ORDER BY dataset"))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def table_dataset(table_path):
+    """由数据表路径推断数据集名称：Bio-imaging-2020-pubmed_research.csv 或 Bio-imaging/year=2020/ -> Bio-imaging。"""
+    if table_path.endswith(".csv"):
+        name = os.path.basename(table_path)
+        match = re.match(r"(.+)-\d{4}-pubmed_research\.csv$", name)
+        return match.group(1) if match else os.path.splitext(name)[0]
+    return os.path.basename(os.path.dirname(os.path.normpath(table_path)))
+
+
+def index_directory(index, path, batch_size=1000):
+    """把目录中已导出的数据表加入索引（已经索引过的文献跳过），用于为导出索引功能之前的数据补建索引。"""
+    added = 0
+    for table_path in find_tables(path):
+        df = read_table(table_path)
+        records = df.astype(object).where(df.notna(), None).to_dict("records")
+        dataset = table_dataset(table_path)
+        for start in range(0, len(records), batch_size):
+            added += index.add(records[start:start + batch_size], dataset)
+        print(f"Indexed {table_path} as {dataset}")
+    return added
+
+
+def export_query(index, query, directory, name="query", output_format="csv", **filters):
+    """
+    把查询结果按年份导出为数据集（与 harvest_topic 的输出格式相同，burble.data_imaging 可以直接使用），
+    返回导出的篇数。filters 为 search 的 dataset、start_year、end_year。
+    """
+    os.makedirs(directory, exist_ok=True)
+    writers = {}
+    try:
+        for record in index.records(index.search(query, **filters)):
+            year = record["Publication Year"]
+            if year not in writers:
+                writers[year] = open_writer(directory, name, year, output_format)
+            writers[year].write(record)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return sum(writer.count for writer in writers.values())
+
+
+if __name__ == "__main__":
+    # 例如：python text_index.py "transformer AND segmentation" --dataset Bio-imaging --years 2018 2024
+    parser = argparse.ArgumentParser(description="Query the local full-text index of harvested articles")
+    parser.add_argument("query", nargs="?", help="boolean query, e.g. 'transformer AND (segmentation OR title:unet)'")
+    parser.add_argument("--index", default="pubmed_index.sqlite", help="index database")
+    parser.add_argument("--dataset", help="only search this dataset")
+    parser.add_argument("--years", nargs=2, type=int, metavar=("START", "END"), help="publication year range")
+    parser.add_argument("--export", metavar="DIR", help="export the matching articles as a dataset to DIR")
+    parser.add_argument("--build", metavar="DIR", help="index the datasets already exported to DIR")
+    parser.add_argument("--optimize", action="store_true", help="merge posting blocks after building")
+    args = parser.parse_args()
+
+    text_index = TextIndex(args.index)
+    if args.build:
+        print(f"{index_directory(text_index, args.build)} articles added to {args.index}")
+    if args.optimize:
+        text_index.optimize()
+    if args.query:
+        filters = {"dataset": args.dataset}
+        if args.years:
+            filters["start_year"], filters["end_year"] = args.years
+        start = time.perf_counter()
+        doc_ids = text_index.search(args.query, **filters)
+        print(f"{len(doc_ids)} articles match ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        if args.export:
+            print(f"{export_query(text_index, args.query, args.export, **filters)} articles exported to {args.export}")
+        else:
+            for record in text_index.records(doc_ids[:20]):
+                print(f"{record['PMID']}  {record['Publication Year']}  {record['Title']}")
+    text_index.close()
@@ -0,0 +1,352 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from aggregate import KEYWORD_STOPWORDS, TABLES_DIR, content_hash, table_signature
+from metrics import METRICS
+
+# 趋势矩阵的维度 -> 统计的列；每个维度一个 年份 × 取值 的计数矩阵
+DIMENSIONS = {
+    "keyword": "Keywords",
+    "country": "Country",
+    "journal": "Journal",
+}
+# 统计趋势需要读取的列
+TREND_COLUMNS = ["Publication Year", "Keywords", "Country", "Journal"]
+# 缺失值的占位文本，不计入趋势
+UNKNOWN_VALUES = {"Unknown", "Unknown Country", "No journal available"}
+
+TRENDS_FILE = "trends.npz"           # 合并后的趋势矩阵，保存在 frequency_tables 目录中
+PARTIALS_DIR = "trend_partials"      # 每个数据表的部分计数，保存在 frequency_tables 目录中
+# 部分计数的统计规则版本；统计逻辑变化时加 1，旧的部分计数全部重新统计
+TRENDS_VERSION = 1
+
+
+def _years(column):
+    """出版年份列转为浮点数组，无法解析的值为 NaN。"""
+    return pd.to_numeric(column.astype(object), errors="coerce").to_numpy(dtype=float)
+
+
+def _dimension_values(df, dimension):
+    """
+    返回 (行号数组, 取值 Series)：关键词按逗号拆分、去掉首尾空白和无用词（与 aggregate.count_keywords 一致），
+    其他维度每行一个值；空值和 UNKNOWN_VALUES 被去掉。
+    """
+    column = df[DIMENSIONS[dimension]].reset_index(drop=True).astype(object)
+    rows = np.arange(len(column))
+    if dimension == "keyword":
+        column = column.dropna().astype(str).str.split(",").explode().str.strip()
+        column = column[~column.str.lower().isin(KEYWORD_STOPWORDS)]
+        rows = column.index.to_numpy()
+    mask = column.notna().to_numpy()
+    column, rows = column[mask], rows[mask]
+    mask = ~column.astype(str).isin(UNKNOWN_VALUES | {""}).to_numpy()
+    return rows[mask], column[mask].astype(str)
+
+
+def _triples(years, labels_index, weights=None):
+    """(年份, 取值编号) 对求和，返回 (年份, 编号, 次数) 三个数组（按年份、编号排序）。"""
+    if len(years) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    base = int(years.min())
+    size = int(labels_index.max()) + 1
+    matrix = sp.coo_matrix((np.ones(len(years), dtype=np.int64) if weights is None else weights,
+                            (years - base, labels_index)),
+                           shape=(int(years.max()) - base + 1, size)).tocsr().tocoo()  # 重复的 (年份, 编号) 相加
+    return matrix.row.astype(np.int64) + base, matrix.col.astype(np.int64), matrix.data.astype(np.int64)
+
+
+def trend_partial(df):
+    """
+    一次向量化扫描一个数据表，返回部分计数：
+    {"articles": {"years", "counts"}, 维度: {"labels", "years", "terms", "counts"}}，
+    没有有效出版年份的行不计入；数据表中没有的列得到空计数。
+    """
+    years = _years(df["Publication Year"]) if "Publication Year" in df else np.full(len(df), np.nan)
+    valid = ~np.isnan(years)
+    article_years, article_counts = np.unique(years[valid].astype(np.int64), return_counts=True)
+    partial = {"articles": {"years": article_years.tolist(), "counts": article_counts.tolist()}}
+    for dimension, column in DIMENSIONS.items():
+        if column not in df:
+            partial[dimension] = {"labels": [], "years": [], "terms": [], "counts": []}
+            continue
+        rows, values = _dimension_values(df, dimension)
+        keep = valid[rows]
+        codes, labels = pd.factorize(values[keep])
+        term_years, terms, counts = _triples(years[rows[keep]].astype(np.int64), codes)
+        partial[dimension] = {"labels": [str(label) for label in labels], "years": term_years.tolist(),
+                              "terms": terms.tolist(), "counts": counts.tolist()}
+    return partial
+
+
+class TrendMatrices:
+    """
+    全部数据表的趋势矩阵：years 是连续的年份（没有文献的年份为 0），totals 是每年的文献数，
+    counts[维度] 是 年份 × 取值 的 CSR 计数矩阵（行对应 years，列对应 labels[维度]，取值按字母排序）。
+    """
+
+    def __init__(self, years, totals, labels, counts):
+        self.years = years
+        self.totals = totals
+        self.labels = labels
+        self.counts = counts
+
+    @classmethod
+    def from_partials(cls, partials):
+        """合并多个部分计数（见 trend_partial）：取值表取并集，相同 (年份, 取值) 的次数相加。"""
+        partials = list(partials)
+        all_years = np.concatenate([np.asarray(partial["articles"]["years"], dtype=np.int64) for partial in partials]
+                                   + [np.zeros(0, dtype=np.int64)])
+        if len(all_years):
+            years = np.arange(all_years.min(), all_years.max() + 1)
+        else:
+            years = np.zeros(0, dtype=np.int64)
+        totals = np.zeros(len(years), dtype=np.int64)
+        for partial in partials:
+            if partial["articles"]["years"]:
+                np.add.at(totals, np.asarray(partial["articles"]["years"]) - years[0],
+                          np.asarray(partial["articles"]["counts"], dtype=np.int64))
+        labels, counts = {}, {}
+        for dimension in DIMENSIONS:
+            parts = [partial[dimension] for partial in partials]
+            merged, inverse = np.unique(np.array([label for part in parts for label in part["labels"]], dtype=object),
+                                        return_inverse=True)
+            # 各部分的取值编号映射到合并后的编号
+            offsets = np.cumsum([0] + [len(part["labels"]) for part in parts])
+            terms = np.concatenate([inverse[offset + np.asarray(part["terms"], dtype=np.int64)]
+                                    for offset, part in zip(offsets, parts)] + [np.zeros(0, dtype=np.int64)])
+            rows = np.concatenate([np.asarray(part["years"], dtype=np.int64) for part in parts]
+                                  + [np.zeros(0, dtype=np.int64)])
+            data = np.concatenate([np.asarray(part["counts"], dtype=np.int64) for part in parts]
+                                  + [np.zeros(0, dtype=np.int64)])
+            labels[dimension] = merged
+            counts[dimension] = sp.csr_matrix((data, (rows - (years[0] if len(years) else 0), terms)),
+                                              shape=(len(years), len(merged)))
+        return cls(years, totals, labels, counts)
+
+    @classmethod
+    def from_frame(cls, df):
+        """直接统计一个 DataFrame（例如全文索引的查询结果）。"""
+        return cls.from_partials([trend_partial(df)])
+
+    def partial(self):
+        """转回部分计数（用于合并多个目录的趋势矩阵，见 merge_trends）。"""
+        partial = {"articles": {"years": self.years.tolist(), "counts": self.totals.tolist()}}
+        for dimension, matrix in self.counts.items():
+            coo = matrix.tocoo()
+            partial[dimension] = {"labels": self.labels[dimension].tolist(), "years": (coo.row + self.years[0]).tolist()
+                                  if len(self.years) else [], "terms": coo.col.tolist(), "counts": coo.data.tolist()}
+        return partial
+
+    def save(self, path):
+        """保存为 .npz（先写临时文件再替换）。"""
+        arrays = {"years": self.years, "totals": self.totals}
+        for dimension, matrix in self.counts.items():
+            arrays.update({dimension + "_labels": np.asarray(self.labels[dimension], dtype=str),
+                           dimension + "_data": matrix.data, dimension + "_indices": matrix.indices,
+                           dimension + "_indptr": matrix.indptr})
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            years, totals = saved["years"], saved["totals"]
+            labels = {dimension: saved[dimension + "_labels"].astype(object) for dimension in DIMENSIONS}
+            counts = {dimension: sp.csr_matrix((saved[dimension + "_data"], saved[dimension + "_indices"],
+                                                saved[dimension + "_indptr"]),
+                                               shape=(len(years), len(labels[dimension])))
+                      for dimension in DIMENSIONS}
+        return cls(years, totals, labels, counts)
+
+    def top(self, dimension, k=10):
+        """总次数最多的 k 个取值（次数相同时按字母顺序）。"""
+        totals = np.asarray(self.counts[dimension].sum(axis=0)).ravel()
+        order = np.lexsort((self.labels[dimension], -totals))[:k]
+        return [self.labels[dimension][i] for i in order if totals[i] > 0]
+
+    def series(self, dimension, values, share=False):
+        """values 中各取值的逐年次数（DataFrame，行为年份）；share=True 时为占当年文献数的比例。"""
+        positions = np.searchsorted(self.labels[dimension], np.asarray(values, dtype=object))
+        frame = pd.DataFrame(self.counts[dimension][:, positions].toarray(), index=self.years, columns=list(values))
+        if share:
+            frame = frame.div(np.maximum(self.totals, 1), axis=0)
+        return frame
+
+
+def merge_trends(trends_list):
+    """合并多个目录的趋势矩阵。"""
+    return TrendMatrices.from_partials(trends.partial() for trends in trends_list)
+
+
+def _window_rows(trends, end_year, window):
+    """years 中 (end_year - window, end_year] 的行号范围；没有任何年份时为空范围。"""
+    if not len(trends.years):
+        return 0, 0
+    end_year = int(trends.years[-1]) if end_year is None else end_year
+    stop = int(np.searchsorted(trends.years, end_year, side="right"))
+    return max(stop - window, 0), stop
+
+
+def growth_rates(trends, dimension, window=5, end_year=None):
+    """
+    每个取值的增长率：最近 window 年（截至 end_year，默认最后一年）与之前 window 年的次数之比，换算为年均增长率
+    ((最近 + 1) / (之前 + 1)) ** (1 / window) - 1（加 1 平滑，之前没有出现过的取值不会得到无穷大）。
+    返回 DataFrame：Value, Recent, Previous, Growth，按 Growth 从高到低。
+    """
+    matrix = trends.counts[dimension]
+    start, stop = _window_rows(trends, end_year, window)
+    recent = np.asarray(matrix[start:stop].sum(axis=0)).ravel()
+    previous = np.asarray(matrix[max(start - window, 0):start].sum(axis=0)).ravel()
+    growth = ((recent + 1) / (previous + 1)) ** (1 / window) - 1
+    frame = pd.DataFrame({"Value": trends.labels[dimension], "Recent": recent, "Previous": previous,
+                          "Growth": growth})
+    return frame.sort_values(["Growth", "Value"], ascending=[False, True], ignore_index=True)
+
+
+def emerging_scores(trends, dimension, window=3, min_count=5, end_year=None):
+    """
+    新兴程度：最近 window 年的占比（次数 / 文献数）相对此前全部年份占比的对数比
+    log2((最近次数 + 0.5) / 最近文献数) - log2((此前次数 + 0.5) / 此前文献数)，
+    以及最近 window 年逐年占比的线性趋势斜率（每年的占比变化）。只保留最近次数不少于 min_count 的取值。
+    返回 DataFrame：Value, Recent, History, Score, Slope，按 Score 从高到低。
+    """
+    matrix = trends.counts[dimension]
+    start, stop = _window_rows(trends, end_year, window)
+    recent = np.asarray(matrix[start:stop].sum(axis=0)).ravel()
+    history = np.asarray(matrix[:start].sum(axis=0)).ravel()
+    recent_articles = max(int(trends.totals[start:stop].sum()), 1)
+    history_articles = max(int(trends.totals[:start].sum()), 1)
+    score = np.log2((recent + 0.5) / recent_articles) - np.log2((history + 0.5) / history_articles)
+
+    # 最近 window 年逐年占比对年份的最小二乘斜率：sum((x - x̄) * 占比) / sum((x - x̄)²)
+    x = np.arange(stop - start, dtype=float)
+    x -= x.mean() if len(x) else 0.0
+    weights = x / max(float((x ** 2).sum()), 1.0) / np.maximum(trends.totals[start:stop], 1)
+    slope = np.asarray(matrix[start:stop].T @ weights).ravel()
+
+    keep = recent >= min_count
+    frame = pd.DataFrame({"Value": trends.labels[dimension][keep], "Recent": recent[keep],
+                          "History": history[keep], "Score": score[keep], "Slope": slope[keep]})
+    return frame.sort_values(["Score", "Value"], ascending=[False, True], ignore_index=True)
+
+
+def trend_report(trends, dimension, window=5, min_count=5, end_year=None):
+    """一个维度的趋势表：总次数、增长率和新兴程度（最近 window 年），按总次数从高到低。"""
+    total = np.asarray(trends.counts[dimension].sum(axis=0)).ravel()
+    frame = pd.DataFrame({"Value": trends.labels[dimension], "Count": total})
+    growth = growth_rates(trends, dimension, window, end_year)[["Value", "Growth"]]
+    emerging = emerging_scores(trends, dimension, window, min_count, end_year)[["Value", "Score", "Slope"]]
+    frame = frame.merge(growth, on="Value", how="left").merge(emerging, on="Value", how="left")
+    return frame.sort_values(["Count", "Value"], ascending=[False, True], ignore_index=True)
+
+
+def save_trend_tables(trends, directory, **options):
+    """把各维度的趋势表保存为 <directory>/frequency_tables/trends_<维度>.csv，并保存趋势矩阵 trends.npz。"""
+    tables_dir = os.path.join(directory, TABLES_DIR)
+    os.makedirs(tables_dir, exist_ok=True)
+    for dimension in DIMENSIONS:
+        trend_report(trends, dimension, **options).to_csv(os.path.join(tables_dir, f"trends_{dimension}.csv"),
+                                                           index=False, encoding="utf-8-sig")
+    trends.save(os.path.join(tables_dir, TRENDS_FILE))
+    return tables_dir
+
+
+def load_trends(directory):
+    """读取 save_trend_tables 或 TrendIndex 保存的趋势矩阵，不存在时返回 None。"""
+    path = os.path.join(directory, TABLES_DIR, TRENDS_FILE)
+    return TrendMatrices.load(path) if os.path.exists(path) else None
+
+
+class TrendIndex:
+    """
+    数据目录的增量趋势索引（与 aggregate.AggregateIndex 相同的做法）：
+    frequency_tables/trend_partials/manifest.json 记录每个数据表的签名和内容哈希，每个数据表的部分计数保存在
+    trend_partials/<哈希>.json，合并后的矩阵缓存在 frequency_tables/trends.npz。
+    新的年份分区到来时只读取新增或变化的数据表，合并部分计数得到新的矩阵；没有变化时直接读取缓存的矩阵。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.trends_path = os.path.join(directory, TABLES_DIR, TRENDS_FILE)
+        self.partials_dir = os.path.join(directory, TABLES_DIR, PARTIALS_DIR)
+        self.manifest_path = os.path.join(self.partials_dir, "manifest.json")
+        os.makedirs(self.partials_dir, exist_ok=True)
+        self.manifest = {"version": TRENDS_VERSION, "tables": {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == TRENDS_VERSION:
+                self.manifest = manifest
+
+    def _save(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _partial_path(self, key):
+        return os.path.join(self.partials_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _load_partial(self, key):
+        with open(self._partial_path(key), encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_partial(self, key, partial):
+        with open(self._partial_path(key), "w", encoding="utf-8") as f:
+            json.dump(partial, f, ensure_ascii=False)
+
+    def update(self, table_paths, load):
+        """
+        更新索引并返回 (趋势矩阵, 是否有数据表新增、变化或删除)。
+        :param table_paths: 目录中当前的全部数据表路径
+        :param load: load(数据表路径) -> DataFrame（至少包含 TREND_COLUMNS 中存在的列），只对新增或变化的数据表调用
+        """
+        entries = self.manifest["tables"]
+        keys = []
+        changed = False
+        for table_path in table_paths:
+            key = os.path.relpath(table_path, self.directory)
+            keys.append(key)
+            entry = entries.get(key)
+            signature = table_signature(table_path)
+            if entry is not None and os.path.exists(self._partial_path(key)):
+                if entry["signature"] == signature:
+                    continue
+                # 签名变化（例如文件被重新写入）但内容没变时，只更新签名
+                digest = content_hash(table_path)
+                if entry["hash"] == digest:
+                    entry["signature"] = signature
+                    continue
+            else:
+                digest = content_hash(table_path)
+
+            print(f"Counting trends in {table_path}...")
+            with METRICS.stage("load"):
+                df = load(table_path)
+            with METRICS.stage("aggregate"):
+                self._save_partial(key, trend_partial(df))
+            METRICS.inc("trend_tables_counted_total")
+            entries[key] = {"signature": signature, "hash": digest}
+            changed = True
+
+        for key in set(entries) - set(keys):
+            del entries[key]
+            if os.path.exists(self._partial_path(key)):
+                os.remove(self._partial_path(key))
+            changed = True
+        self._save()
+
+        # 没有数据表时返回空矩阵，不读取之前缓存的矩阵
+        if not changed and keys and os.path.exists(self.trends_path):
+            return TrendMatrices.load(self.trends_path), False
+        with METRICS.stage("aggregate"):
+            trends = TrendMatrices.from_partials(self._load_partial(key) for key in keys)
+        trends.save(self.trends_path)
+        return trends, changed
@@ -0,0 +1,159 @@
+import glob
+import os
+
+import pandas as pd
+
+from metrics import METRICS
+
+# Parquet 输出中对这些重复度高的列使用字典编码
+DICTIONARY_COLUMNS = ["Publication Year", "Journal", "University", "Country"]
+
+
+class ChunkWriter:
+    """
+    分块写入器基类：每累计 chunk_size 条记录写入一次，内存中最多保留一块数据。
+    Index 列跨块连续编号；同一输出中 PMID 重复的记录只写入一次。
+    追加模式下 Index 接着已有行号继续，并跳过 PMID 已存在的记录；已有行没有 PMID 时（旧文件）按标题去重。
+    提供 index（text_index.TextIndex）时，每块写入后同时加入数据集 dataset 的全文索引。
+    子类实现 _write_chunk(df)。
+    """
+
+    def __init__(self, chunk_size=1000, index=None, dataset=None):
+        self.chunk_size = chunk_size
+        self.index = index
+        self.dataset = dataset
+        self.count = 0  # 已写入的行数（含追加模式下已有的行）
+        self._buffer = []
+        self._seen_pmids = set()
+        self._existing_titles = set()
+
+    def _load_existing(self, existing):
+        """
+        追加模式：根据已有数据（含 Title/PMID 列的 DataFrame）初始化行号和去重集合。
+        有 PMID 的行按 PMID 去重（标题相同的不同文献都保留）；只有没有 PMID 的行（旧文件）才按标题去重。
+        """
+        self.count = len(existing)
+        if "PMID" in existing:
+            self._seen_pmids = set(existing["PMID"].dropna())
+            self._existing_titles = set(existing.loc[existing["PMID"].isna(), "Title"].dropna())
+        else:
+            self._existing_titles = set(existing["Title"].dropna())
+
+    def write(self, article):
+        """写入一条记录，返回是否实际写入（重复记录返回 False）。"""
+        pmid = article.get("PMID")
+        if pmid is not None:
+            if pmid in self._seen_pmids:
+                METRICS.inc("duplicates_skipped_total")
+                return False
+            self._seen_pmids.add(pmid)
+        if article["Title"] in self._existing_titles:
+            METRICS.inc("duplicates_skipped_total")
+            return False
+
+        article["Index"] = self.count + len(self._buffer) + 1
+        self._buffer.append(article)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        if not self._buffer:
+            return
+        with METRICS.stage("write"):
+            self._write_chunk(pd.DataFrame(self._buffer))
+        METRICS.inc("records_written_total", len(self._buffer))
+        if self.index is not None:
+            self.index.add(self._buffer, self.dataset)
+        self.count += len(self._buffer)
+        self._buffer = []
+
+    def _write_chunk(self, df):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CsvChunkWriter(ChunkWriter):
+    """分块写入 CSV 文件；append=True 时接着已有文件写，不重写已有内容。"""
+
+    def __init__(self, filepath, chunk_size=1000, append=False, index=None, dataset=None):
+        super().__init__(chunk_size, index, dataset)
+        self.filepath = filepath
+        self._header = True
+        self._columns = None
+
+        if append and os.path.exists(filepath):
+            existing = pd.read_csv(filepath, usecols=lambda column: column in ("Title", "PMID"),
+                                   dtype=str, encoding="utf-8-sig")
+            self._load_existing(existing)
+            self._header = False
+            # 追加的行按已有文件的列顺序写入（旧文件可能没有 PMID 等新增列）
+            self._columns = list(pd.read_csv(filepath, nrows=0, encoding="utf-8-sig").columns)
+
+    def _write_chunk(self, df):
+        if self._columns is not None:
+            df = df.reindex(columns=self._columns)
+        if self._header:
+            # 第一块覆盖写入并带表头（UTF-8 BOM，便于 Excel 打开）
+            df.to_csv(self.filepath, index=False, encoding="utf-8-sig")
+            self._header = False
+        else:
+            df.to_csv(self.filepath, mode="a", header=False, index=False, encoding="utf-8")
+
+
+class ParquetChunkWriter(ChunkWriter):
+    """
+    分块写入 Parquet 分区目录（例如 <输出目录>/Bio-imaging/year=2020/），每块为文件中的一个 row group。
+    覆盖模式下先删除目录中已有的 part 文件；append=True 时新写一个 part 文件，已有文件保持不变。
+    """
+
+    def __init__(self, directory, chunk_size=1000, append=False, index=None, dataset=None):
+        super().__init__(chunk_size, index, dataset)
+        self.directory = directory
+        self.filepath = None
+        self._writer = None
+        self._schema = None
+
+        os.makedirs(directory, exist_ok=True)
+        parts = sorted(glob.glob(os.path.join(directory, "part-*.parquet")))
+        if append and parts:
+            import pyarrow.parquet as pq
+
+            names = pq.read_schema(parts[0]).names
+            existing = pd.read_parquet(directory, columns=[column for column in ("Title", "PMID") if column in names])
+            self._load_existing(existing)
+        else:
+            for part in parts:
+                os.remove(part)
+            parts = []
+        self.filepath = os.path.join(directory, "part-{:04d}.parquet".format(len(parts)))
+
+    def _write_chunk(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            # 除 Index 外全部按字符串存储，保证各块的 schema 一致
+            self._schema = pa.schema([(column, pa.int64() if column == "Index" else pa.string())
+                                      for column in df.columns])
+            dictionary_columns = [column for column in DICTIONARY_COLUMNS if column in df.columns]
+            self._writer = pq.ParquetWriter(self.filepath, self._schema, use_dictionary=dictionary_columns,
+                                            compression="zstd")
+        df = df.reindex(columns=self._schema.names)
+        table = pa.Table.from_pandas(df.astype({column: "string" for column in df.columns if column != "Index"}),
+                                     schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        super().close()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None